@@ -1,19 +1,15 @@
 # Standard Library
 import os
+import bisect
+import importlib.util
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
 
 # Third-party
 import pandas as pd
-try:
-    import pyxlsb
-    XLSB_SUPPORT = True
-except ImportError:
-    XLSB_SUPPORT = False
-
-# Local
-from Spec_Comparator import get_first_price_for_spec
+# Only check that pyxlsb is installed; pandas imports it when an .xlsb file is read
+XLSB_SUPPORT = importlib.util.find_spec("pyxlsb") is not None
 
 
 def choose_file():
@@ -29,6 +25,8 @@ def read_excel_file(file_path):
     if file_ext == '.xlsb':
         if not XLSB_SUPPORT:
             raise ImportError("pyxlsb is required to read .xlsb files. Install it with: pip install pyxlsb")
+        # Imported here rather than left to pandas so PyInstaller bundles pyxlsb
+        import pyxlsb  # noqa: F401
         return pd.ExcelFile(file_path, engine='pyxlsb')
     else:
         # Default engine for .xlsx and .xls files
@@ -49,18 +47,48 @@ def find_col(cols, keywords):
             return col
     return None
 
-def get_bom_history_rows(bom_df, part_number):
+BOM_BLOCK_END = "HP CM - ALL OS - BTO"
+
+def build_bom_index(bom_df):
+    """
+    Index of the BOM sheet for get_bom_history_rows, built once per analysis:
+    ({cell value: first row position}, sorted positions of the rows ending a block,
+    i.e. rows with a cell containing "HP CM - ALL OS - BTO").
+    """
+    values = bom_df.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    first_rows = {}
+    for pos in range(len(values)):
+        for value, is_missing in zip(values[pos], missing[pos]):
+            # NaN never equals a part number, so empty cells are not indexed
+            if is_missing:
+                continue
+            try:
+                first_rows.setdefault(value, pos)
+            except TypeError:
+                pass  # Unhashable cell, can't equal a part number from the sheet either
+    block_end = pd.Series(False, index=bom_df.index)
+    for col in bom_df.columns:
+        if not pd.api.types.is_numeric_dtype(bom_df[col]):
+            block_end |= bom_df[col].astype(str).str.contains(BOM_BLOCK_END, regex=False).to_numpy()
+    return first_rows, block_end.to_numpy().nonzero()[0].tolist()
+
+def get_bom_history_rows(bom_df, part_number, bom_index=None):
     # Find the row with the part number, then all rows below until "HP CM - ALL OS - BTO"
-    idx = bom_df[bom_df.apply(lambda row: part_number in row.values, axis=1)].index
-    if len(idx) == 0:
+    if bom_index is None:
+        bom_index = build_bom_index(bom_df)
+    first_rows, block_ends = bom_index
+    if pd.isna(part_number):
         return None
-    start = idx[0]
-    rows = []
-    for i in range(start, len(bom_df)):
-        rows.append(bom_df.iloc[i])
-        if "HP CM - ALL OS - BTO" in str(bom_df.iloc[i].values):
-            break
-    return pd.DataFrame(rows, columns=bom_df.columns)
+    try:
+        start = first_rows.get(part_number)
+    except TypeError:
+        return None
+    if start is None:
+        return None
+    end_idx = bisect.bisect_left(block_ends, start)
+    end = block_ends[end_idx] + 1 if end_idx < len(block_ends) else len(bom_df)
+    return bom_df.iloc[start:end]
 
 def find_bom_sheet(xl):
     keywords = ["doc kit", "sku", "summary", "for hp"]
@@ -312,9 +340,11 @@ class HistoricalCostDeltaAnalyzer:
             
             # Load BOM data if needed
             bom_df = None
+            bom_index = None
             if self.include_bom_var.get():
                 self.update_status("Loading BOM sheet...")
                 bom_df = xl.parse(bom_sheet) if bom_sheet else None
+                bom_index = build_bom_index(bom_df) if bom_df is not None else None
                 
             self.progress_var.set(40)
             
@@ -326,6 +356,12 @@ class HistoricalCostDeltaAnalyzer:
             total_rows = len(df)
             processed = 0
             
+            # Spec prices come from the SPEC PRICING FILES folder, which is parsed once
+            # on the first spec variance instead of once per row
+            folder = os.path.dirname(os.path.dirname(os.path.dirname(file_path)))
+            spec_folder = os.path.join(folder, "SPEC PRICING FILES")
+            spec_catalog = None
+            
             for idx, row in df.iterrows():
                 variance = row[variance_col]
                 if pd.isna(variance) or variance <= 0:
@@ -338,7 +374,7 @@ class HistoricalCostDeltaAnalyzer:
                 # BOM Variance
                 if self.include_bom_var.get() and ("volume" in remark or "bom" in remark):
                     if bom_df is not None and part_number is not None:
-                        bom_rows = get_bom_history_rows(bom_df, part_number)
+                        bom_rows = get_bom_history_rows(bom_df, part_number, bom_index)
                         if bom_rows is not None:
                             for _, bom_row in bom_rows.iterrows():
                                 combined = pd.concat([row, bom_row], axis=0)
@@ -353,10 +389,12 @@ class HistoricalCostDeltaAnalyzer:
                     combined["Source File"] = os.path.basename(file_path)
                     
                     # Find spec price
-                    folder = os.path.dirname(os.path.dirname(os.path.dirname(file_path)))
-                    spec_folder = os.path.join(folder, "SPEC PRICING FILES")
                     if os.path.isdir(spec_folder):
-                        volume, price = get_first_price_for_spec(row[spec_col], spec_folder)
+                        if spec_catalog is None:
+                            # Imported here so the analyzer starts without loading the comparator
+                            from Spec_Comparator import get_first_price_for_spec, load_spec_catalog
+                            spec_catalog = load_spec_catalog(spec_folder)
+                        volume, price = get_first_price_for_spec(row[spec_col], spec_folder, catalog=spec_catalog)
                         combined["Spec Price"] = price
                         combined["Spec Price Volume"] = volume
                     else:
@@ -1,11 +1,32 @@
+# The matching core only needs pandas/numpy. tkinter and openpyxl are imported where
+# they are used so the core imports quickly (e.g. from Historical_Cost_Delta_Analyzer).
 import pandas as pd
+import numpy as np
 import os
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+import sys
+import argparse
+import importlib.util
 import difflib
 import re
+import shutil
+import sqlite3
+import bisect
 import calendar
 import datetime
+import contextlib
+import copy
+import functools
+import hashlib
+import json
+import math
+import pickle
+import queue
+import tempfile
+import threading
+import time
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def extract_date_from_col(col):
     """
@@ -63,40 +84,413 @@ def find_spec_columns(columns):
     return found_columns
 
 
-def normalize_spec_string(s):
-    # Convert to string
-    s = str(s)
+# -------- Spec normalization engine --------
+# Patterns are compiled once at import. Normalization and key-value extraction are
+# memoized in bounded LRU caches, because the same spec strings are normalized over
+# and over across exact matching, fuzzy matching and the MOQ lookup.
+NORMALIZATION_CACHE_SIZE = 65536
+
+_INVISIBLE_CHARS_RE = re.compile(r'[\u200b-\u200f\u202a-\u202e\u2060-\u206f]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_SPACING_RE = re.compile(r'\s*([;:])\s*')
+_KV_DISALLOWED_CHARS_RE = re.compile(r'[^\w\s\.:=xX±\-]')
+# Common pattern for dimensions like 5x6x3 or 5*6*3
+_KV_DIMENSION_RE = re.compile(r'(\w+)\s*[:=]?\s*([\d\.]+[xX\*][\d\.]+(?:[xX\*][\d\.]+)?)')
+_KV_PAIR_RE = re.compile(r'(\w+)\s*[:=]\s*([\w\.xX±\-]+)')
+
+
+@functools.lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_spec_text(s):
     # Replace HTML and Unicode non-breaking spaces with a regular space
     s = s.replace('\xa0', ' ').replace('&nbsp;', ' ')
     # Replace full-width semicolons/colons with ASCII
     s = s.replace('；', ';').replace('：', ':')
     # Remove zero-width and invisible Unicode characters
-    s = re.sub(r'[\u200b-\u200f\u202a-\u202e\u2060-\u206f]', '', s)
+    s = _INVISIBLE_CHARS_RE.sub('', s)
     # Replace all whitespace (spaces, tabs, etc.) with a single space
-    s = re.sub(r'\s+', ' ', s)
+    s = _WHITESPACE_RE.sub(' ', s)
     # Remove spaces around punctuation like ; :
-    s = re.sub(r'\s*([;:])\s*', r'\1', s)
+    s = _PUNCTUATION_SPACING_RE.sub(r'\1', s)
     # Strip and uppercase
     return s.strip().upper()
 
-def extract_kv_pairs(s):
-    s = str(s)
-    s = re.sub(r'[^\w\s\.:=xX±\-]', '', s)
-    s = re.sub(r'\s+', ' ', s)
+def normalize_spec_string(s):
+    return _normalize_spec_text(str(s))
 
-    # Common pattern for dimensions like 5x6x3 or 5*6*3
-    dimension_pattern = r'(\w+)\s*[:=]?\s*([\d\.]+[xX\*][\d\.]+(?:[xX\*][\d\.]+)?)'
-    dimension_matches = re.findall(dimension_pattern, s)
+def normalize_spec_series(series):
+    """
+    Vectorized normalize_spec_string for a whole column. Each distinct value is
+    normalized once with pandas .str operations and mapped back onto the column.
+    """
+    text = series.map(str)
+    uniques = pd.Series(text.unique(), dtype=object)
+    normalized = (
+        uniques.str.replace('\xa0', ' ', regex=False)
+        .str.replace('&nbsp;', ' ', regex=False)
+        .str.replace('；', ';', regex=False)
+        .str.replace('：', ':', regex=False)
+        .str.replace(_INVISIBLE_CHARS_RE, '', regex=True)
+        .str.replace(_WHITESPACE_RE, ' ', regex=True)
+        .str.replace(_PUNCTUATION_SPACING_RE, r'\1', regex=True)
+        .str.strip()
+        .str.upper()
+    )
+    if _PROFILE is not None:
+        _PROFILE.count("normalize_spec_series.unique_values", len(uniques))
+    return text.map(dict(zip(uniques, normalized))).astype(object)
+
+
+@functools.lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _extract_kv_items(s):
+    s = _KV_DISALLOWED_CHARS_RE.sub('', s)
+    s = _WHITESPACE_RE.sub(' ', s)
+
+    dimension_matches = _KV_DIMENSION_RE.findall(s)
 
     kv = {k.lower(): v.replace(' ', '').upper() for k, v in dimension_matches}
 
     # Additional key-value pattern
-    pattern = r'(\w+)\s*[:=]\s*([\w\.xX±\-]+)'
-    for k, v in re.findall(pattern, s):
+    for k, v in _KV_PAIR_RE.findall(s):
         if k.lower() not in kv:
             kv[k.lower()] = v.replace(' ', '').upper()
 
-    return kv
+    return tuple(kv.items())
+
+def extract_kv_pairs(s):
+    # Cached as a tuple so callers always get their own dict
+    return dict(_extract_kv_items(str(s)))
+
+
+# -------- Spec feature vectors --------
+# Optional "vector" match engine. Each normalized spec is parsed into unit-normalized
+# numeric attributes (grammage, dimensions in mm, pages, print colors) and a bag of
+# tokens hashed into a fixed number of buckets. A quote spec is then scored against a
+# whole spec column at once with NumPy, independent of the order of the spec's parts.
+MATCH_ENGINES = ("difflib", "vector")
+SPEC_NUMERIC_FEATURES = ("gsm", "length_mm", "width_mm", "depth_mm", "pages", "colors_front", "colors_back")
+# Token buckets per spec; 256 float32 buckets cost 1 KB per catalog row
+SPEC_TOKEN_BUCKETS = 256
+# Share of the numeric attributes in the score when either spec has any
+SPEC_NUMERIC_WEIGHT = 0.3
+# Minimum vector score for a fuzzy match. Higher than difflib's 0.85 because two specs
+# stating the same attributes already get the whole numeric share of the score.
+VECTOR_MATCH_THRESHOLD = 0.9
+
+_UNIT_TO_MM = {"MM": 1.0, "CM": 10.0, "IN": 25.4, "INCH": 25.4, "INCHES": 25.4, '"': 25.4}
+_PAPER_SIZES_MM = {"A3": (420.0, 297.0), "A4": (297.0, 210.0), "A5": (210.0, 148.0), "A6": (148.0, 105.0),
+                   "B5": (250.0, 176.0), "LETTER": (279.4, 215.9), "LEGAL": (355.6, 215.9)}
+_FEATURE_GSM_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:GSM|G/M2|G/M²|GRAMS?)\b')
+_FEATURE_DIMENSION_RE = re.compile(
+    r'(\d+(?:\.\d+)?)\s*[X\*]\s*(\d+(?:\.\d+)?)(?:\s*[X\*]\s*(\d+(?:\.\d+)?))?\s*(MM|CM|INCHES|INCH|IN\b|")?')
+_FEATURE_PAPER_SIZE_RE = re.compile(r'\b(A3|A4|A5|A6|B5|LETTER|LEGAL)\b')
+_FEATURE_PAGES_RE = re.compile(r'(?:(\d+)\s*(?:PAGES?|PP|PGS?)\b|\bPAGES?\s*[:=]?\s*(\d+))')
+_FEATURE_COLORS_RE = re.compile(r'\b(\d)\s*C?\s*/\s*(\d)\s*C?\b')
+_FEATURE_TOKEN_RE = re.compile(r'[A-Z0-9]+(?:\.[0-9]+)?')
+
+
+@functools.lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _spec_features(norm_spec):
+    numeric = dict.fromkeys(SPEC_NUMERIC_FEATURES, np.nan)
+
+    gsm = _FEATURE_GSM_RE.search(norm_spec)
+    if gsm:
+        numeric["gsm"] = float(gsm.group(1))
+
+    dimension = _FEATURE_DIMENSION_RE.search(norm_spec)
+    if dimension:
+        scale = _UNIT_TO_MM.get((dimension.group(4) or "MM").strip(), 1.0)
+        sides = [float(v) * scale for v in dimension.group(1, 2, 3) if v]
+    else:
+        paper_size = _FEATURE_PAPER_SIZE_RE.search(norm_spec)
+        sides = list(_PAPER_SIZES_MM[paper_size.group(1)]) if paper_size else []
+    # Largest side first, so 210x297 and 297x210 are the same size
+    for name, side in zip(("length_mm", "width_mm", "depth_mm"), sorted(sides, reverse=True)):
+        numeric[name] = side
+
+    pages = _FEATURE_PAGES_RE.search(norm_spec)
+    if pages:
+        numeric["pages"] = float(pages.group(1) or pages.group(2))
+
+    colors = _FEATURE_COLORS_RE.search(norm_spec)
+    if colors:
+        numeric["colors_front"], numeric["colors_back"] = float(colors.group(1)), float(colors.group(2))
+    elif "CMYK" in norm_spec:
+        numeric["colors_front"] = 4.0
+
+    buckets = tuple(sorted({zlib.crc32(token.encode("utf-8")) % SPEC_TOKEN_BUCKETS
+                            for token in _FEATURE_TOKEN_RE.findall(norm_spec)}))
+    return tuple(numeric[name] for name in SPEC_NUMERIC_FEATURES), buckets
+
+def spec_feature_vector(s):
+    """
+    (numeric, tokens) feature vectors of a spec: numeric holds SPEC_NUMERIC_FEATURES (NaN
+    where the spec doesn't state one) and tokens is the L2-normalized hashed token bag.
+    """
+    numeric, buckets = _spec_features(normalize_spec_string(s))
+    tokens = np.zeros(SPEC_TOKEN_BUCKETS, dtype=np.float32)
+    if buckets:
+        tokens[list(buckets)] = 1.0 / math.sqrt(len(buckets))
+    return np.array(numeric, dtype=float), tokens
+
+
+def _shared_array_location(array):
+    # How a memory-mapped array of a shared catalog file (see write_shared_catalog) is pickled
+    return array.filename, array.offset, array.shape, array.dtype.str
+
+def _map_shared_array(location):
+    filename, offset, shape, dtype = location
+    return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+def _encode_shared_strings(values):
+    """
+    (offsets, missing, data) arrays holding a text column as one UTF-8 blob for a shared
+    catalog file, or None if the column holds anything but text and NaN.
+    """
+    missing = np.zeros(len(values), dtype=bool)
+    encoded = []
+    for row, value in enumerate(values):
+        if isinstance(value, str):
+            encoded.append(value.encode("utf-8", "surrogatepass"))
+        elif isinstance(value, float) and math.isnan(value):
+            missing[row] = True
+            encoded.append(b"")
+        else:
+            return None
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, missing, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class SharedStrings:
+    """
+    A text column of a shared catalog file (see write_shared_catalog): the UTF-8 bytes of
+    its values back to back, each value's start offset into them and a missing-value mask.
+    Pickled as the arrays' locations, so a worker maps the file instead of copying the text.
+    """
+    ARRAYS = ("offsets", "missing", "data")
+
+    def __init__(self, offsets, missing, data, dtype):
+        self.offsets = offsets
+        self.missing = missing
+        self.data = data
+        self.dtype = dtype
+
+    def series(self, index, name=None):
+        data = bytes(self.data)
+        offsets = self.offsets.tolist()
+        values = np.empty(len(offsets) - 1, dtype=object)
+        values[:] = [data[start:end].decode("utf-8", "surrogatepass") for start, end in zip(offsets, offsets[1:])]
+        values[np.asarray(self.missing)] = np.nan
+        return pd.Series(values, index=index, name=name, dtype=self.dtype)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in self.ARRAYS:
+            if isinstance(state[name], np.memmap):
+                state[name] = _shared_array_location(state[name])
+        return state
+
+    def __setstate__(self, state):
+        for name in self.ARRAYS:
+            if isinstance(state[name], tuple):
+                state[name] = _map_shared_array(state[name])
+        self.__dict__.update(state)
+
+
+class SpecVectors:
+    """Feature vectors of one normalized spec column, scored against a quote spec in one pass."""
+    ARRAYS = ("numeric", "known", "tokens")
+
+    def __init__(self, norm_specs):
+        self.index = norm_specs.index
+        features = [_spec_features(spec) for spec in norm_specs.tolist()]
+        self.numeric = np.array([numeric for numeric, _ in features], dtype=float).reshape(len(features), len(SPEC_NUMERIC_FEATURES))
+        self.known = ~np.isnan(self.numeric)
+        # Filled in place rather than stacked from per-spec vectors, for large catalogs
+        self.tokens = np.zeros((len(features), SPEC_TOKEN_BUCKETS), dtype=np.float32)
+        for row, (_, buckets) in enumerate(features):
+            if buckets:
+                self.tokens[row, list(buckets)] = 1.0 / math.sqrt(len(buckets))
+
+    def similarity(self, quote_spec):
+        """
+        Score in [0, 1] of quote_spec against every spec: cosine similarity of the token
+        bags, blended with the mean relative closeness of the numeric attributes stated
+        by either side (an attribute stated by one side only counts as 0).
+        """
+        quote_numeric, quote_tokens = spec_feature_vector(quote_spec)
+        token_sim = self.tokens @ quote_tokens
+
+        quote_known = ~np.isnan(quote_numeric)
+        both = self.known & quote_known
+        either = (self.known | quote_known).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.maximum(np.abs(self.numeric), np.abs(quote_numeric))
+            closeness = np.where(scale > 0, 1.0 - np.abs(self.numeric - quote_numeric) / scale, 1.0)
+        closeness = np.where(both, np.clip(closeness, 0.0, 1.0), 0.0).sum(axis=1)
+        numeric_sim = np.divide(closeness, either, out=np.zeros(len(either)), where=either > 0)
+
+        scores = np.where(either > 0,
+                          (1.0 - SPEC_NUMERIC_WEIGHT) * token_sim + SPEC_NUMERIC_WEIGHT * numeric_sim,
+                          token_sim)
+        # Identical specs score 1.0 rather than float32 noise like 0.99999997
+        return np.round(scores, 6)
+
+    def __getstate__(self):
+        # Arrays mapped from a shared catalog file (see write_shared_catalog) are pickled
+        # as their location only, so each worker maps the file instead of copying them
+        state = dict(self.__dict__)
+        for name in self.ARRAYS:
+            array = state[name]
+            if isinstance(array, np.memmap):
+                state[name] = _shared_array_location(array)
+        return state
+
+    def __setstate__(self, state):
+        for name in self.ARRAYS:
+            if isinstance(state[name], tuple):
+                state[name] = _map_shared_array(state[name])
+        self.__dict__.update(state)
+
+
+def normalization_cache_stats():
+    """
+    Hit/miss counters of the normalization memo caches, e.g. to confirm hit rates after
+    a run. Worker processes of a parallel run keep their own caches.
+    """
+    stats = {}
+    for name, cached in (("normalize_spec_string", _normalize_spec_text), ("extract_kv_pairs", _extract_kv_items),
+                         ("spec_features", _spec_features)):
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+    return stats
+
+def clear_normalization_caches():
+    _normalize_spec_text.cache_clear()
+    _extract_kv_items.cache_clear()
+    _spec_features.cache_clear()
+
+
+# -------- Matching profiler --------
+# Opt-in: run_comparator(..., profile=True) records wall time per phase and how much
+# scoring work each phase did, and writes it as a JSON report next to the output.
+# The hooks below are no-ops while _PROFILE is None.
+_PROFILE = None
+
+class MatchProfile:
+    """Phase timers, call counters and per-quote-row distributions of one comparison run."""
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.distributions = {}  # name -> [count, total, min, max]
+        self.total_s = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        dist = self.distributions.get(name)
+        if dist is None:
+            self.distributions[name] = [1, value, value, value]
+        else:
+            dist[0] += 1
+            dist[1] += value
+            dist[2] = min(dist[2], value)
+            dist[3] = max(dist[3], value)
+
+    def merge(self, counters, distributions):
+        """Adds the counters and distributions recorded by a worker process."""
+        for name, n in counters.items():
+            self.count(name, n)
+        for name, (count, total, low, high) in distributions.items():
+            dist = self.distributions.get(name)
+            if dist is None:
+                self.distributions[name] = [count, total, low, high]
+            else:
+                dist[0] += count
+                dist[1] += total
+                dist[2] = min(dist[2], low)
+                dist[3] = max(dist[3], high)
+
+    def add_normalization_calls(self, calls_before):
+        for name, n in _normalization_call_counts().items():
+            self.count(name, n - calls_before.get(name, 0))
+
+    def as_dict(self):
+        phases = {name: round(seconds, 4) for name, seconds in self.phases.items()}
+        if self.total_s is not None:
+            # Dotted names ("write_output.styling") are sub-phases of a top-level phase
+            top_level = sum(seconds for name, seconds in self.phases.items() if "." not in name)
+            phases["other"] = round(max(self.total_s - top_level, 0.0), 4)
+        # Distinct quote specs per quote row searched; repeated specs are searched once
+        unique_ratios = {}
+        for phase, rows_counter in (("match", "quote_rows"), ("closest", "unmatched_rows")):
+            rows = self.counters.get(rows_counter)
+            if rows:
+                unique_ratios[phase] = round(self.counters.get(f"{phase}.unique_quote_specs", 0) / rows, 4)
+        return {
+            "total_s": round(self.total_s, 4) if self.total_s is not None else None,
+            "phases_s": phases,
+            "counters": dict(sorted(self.counters.items())),
+            "unique_spec_ratio": unique_ratios,
+            "per_quote_row": {
+                name: {"rows": count, "total": total, "min": low, "max": high, "mean": round(total / count, 2)}
+                for name, (count, total, low, high) in sorted(self.distributions.items())
+            },
+        }
+
+def _normalization_call_counts():
+    counts = {}
+    for name, cached in (("normalize_spec_string", _normalize_spec_text), ("extract_kv_pairs", _extract_kv_items),
+                         ("spec_features", _spec_features)):
+        info = cached.cache_info()
+        counts[f"{name}.calls"] = info.hits + info.misses
+        counts[f"{name}.cache_misses"] = info.misses
+    return counts
+
+@contextlib.contextmanager
+def profiling_session():
+    """Enables the profiler hooks for the duration of the block and yields the MatchProfile."""
+    global _PROFILE
+    profile = MatchProfile()
+    calls_before = _normalization_call_counts()
+    start = time.perf_counter()
+    _PROFILE = profile
+    try:
+        yield profile
+    finally:
+        _PROFILE = None
+        profile.total_s = time.perf_counter() - start
+        profile.add_normalization_calls(calls_before)
+
+def profile_phase(name):
+    if _PROFILE is None:
+        return contextlib.nullcontext()
+    return _PROFILE.phase(name)
+
+def profile_report_path(output_path):
+    return os.path.splitext(output_path)[0] + "_profile.json"
+
+def write_profile_report(profile, report_path, **run_info):
+    report = dict(run_info, generated=datetime.datetime.now().isoformat(timespec="seconds"))
+    report.update(profile.as_dict())
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
 
 
 def extract_quantity_number(qty_str):
@@ -111,210 +505,1107 @@ def extract_quantity_number(qty_str):
 def is_quantity_column(col_name):
     return extract_quantity_number(col_name) is not None
 
+def parse_quantity_column(values):
+    """extract_quantity_number over a whole column, parsing each distinct value once."""
+    parsed = {}
+    quantities = []
+    for value in values.tolist():
+        try:
+            quantity = parsed[value]
+        except KeyError:
+            quantity = parsed[value] = extract_quantity_number(value)
+        except TypeError:  # Unhashable cell value
+            quantity = extract_quantity_number(value)
+        quantities.append(quantity)
+    return quantities
+
 def find_price_columns(columns, keywords=None):
     if keywords is None:
         keywords = ["price", "cost", "pricing", "unit cost", "unit price", "orderable price"]
     return [col for col in columns if any(k in col.lower() for k in keywords)]
 
-def match_specs_and_append_prices(quote_df, specs_folder):
-    # Dynamically detect all spec columns in the quote file
-    spec_col_candidates = [col for col in quote_df.columns if "spec" in col.strip().lower()]
-    if not spec_col_candidates:
-        raise KeyError("No spec column found in quote_df. Expected a column containing 'spec'.")
-    # We'll search all spec columns for each row
+SPEC_FILE_EXTENSIONS = (".xls", ".xlsx", ".xlsb")
+
 
-    # Check for Spec Line column
-    spec_line_col = None
-    for col in quote_df.columns:
-        if col.strip().lower() == "spec line":
-            spec_line_col = col
-            break
+def list_spec_files(specs_folder):
+    return [f for f in os.listdir(specs_folder) if f.endswith(SPEC_FILE_EXTENSIONS)]
+
+
+def open_spec_workbook(file_path):
+    if file_path.endswith(".xlsb"):
+        return pd.ExcelFile(file_path, engine="pyxlsb")
+    return pd.ExcelFile(file_path)
+
+
+def find_part_number_column(columns):
+    part_number_cols = [
+        col for col in columns
+        if any(
+            kw in col.strip().lower()
+            for kw in ["part number", "partnumber", "p/n", "part", "hppart#"]
+        )
+    ]
+    return part_number_cols[0] if part_number_cols else None
 
-    all_spec_files = [f for f in os.listdir(specs_folder) if f.endswith((".xls", ".xlsx", ".xlsb"))]
-    result_df = quote_df.copy()
-    added_columns = []
 
-    for spec_file in all_spec_files:
-        file_path = os.path.join(specs_folder, spec_file)
+class SpecSheet:
+    """
+    One parsed sheet of a spec file together with the column lookups the matchers need.
+    Only sheets that have a spec column end up in a catalog.
+    """
+    def __init__(self, file_name, sheet_name, df):
+        self.file_name = file_name
+        self.sheet_name = sheet_name
+        self.df = df
+        self.spec_cols = find_spec_columns(df.columns)
+        self.price_cols = find_price_columns(df.columns)
+        self.part_number_col = find_part_number_column(df.columns)
+        # Normalized copy of each spec column, computed once instead of once per quote row
+        self.norm_specs = {col: normalize_spec_series(df[col]) for col in self.spec_cols}
+
+        # Detect if this is a "volume table" style spec file
+        self.volume_cols = [col for col in df.columns if "volume" in col.lower()]
+        self.qty_cols = [col for col in df.columns if re.match(r"^\d+(\.\d+)?k$", col.strip().lower())]
+        self.is_volume_table = bool(self.volume_cols or self.qty_cols)
+        self.first_row_by_spec = {}
+        self.volume_prices = {}
+        self.qty_break_values = []
+        self.qty_break_cols = []
+        self._qty_break_order = []
+        if self.is_volume_table:
+            self._compile_volume_table()
+
+    def _compile_volume_table(self):
+        df = self.df
+        # Price column paired with each volume column: the "<x> pricing" column next to a
+        # "<x> Volume" column, else the sheet's first price column
+        volume_sources = []
+        for vol_col in self.volume_cols:
+            pricing_col = vol_col.replace("Volume", "pricing").replace("volume", "pricing")
+            if pricing_col in df.columns:
+                volume_sources.append((vol_col, pricing_col))
+            elif self.price_cols:
+                volume_sources.append((vol_col, self.price_cols[0]))
+
+        parsed_volumes = {}
+        for vol_col, _ in volume_sources:
+            if vol_col not in parsed_volumes:
+                parsed_volumes[vol_col] = parse_quantity_column(df[vol_col])
+
+        for spec_col in self.spec_cols:
+            norm_specs = self.norm_specs[spec_col].tolist()
+            first_rows = {}
+            for pos, norm_spec in enumerate(norm_specs):
+                first_rows.setdefault(norm_spec, pos)
+            self.first_row_by_spec[spec_col] = first_rows
+
+            # (normalized spec, volume) -> (price, volume). Volume columns are scanned in
+            # sheet order and rows top-down, so the first match wins as in a linear scan.
+            prices = {}
+            for vol_col, price_col in volume_sources:
+                for norm_spec, quantity, price, volume in zip(norm_specs, parsed_volumes[vol_col], df[price_col].tolist(), df[vol_col].tolist()):
+                    if quantity is not None:
+                        prices.setdefault((norm_spec, quantity), (price, volume))
+            self.volume_prices[spec_col] = prices
+
+        # Quantity breaks sorted by size for bisect; columns sharing a size keep the leftmost
+        breaks = {}
+        for order, col in enumerate(self.qty_cols):
+            quantity = extract_quantity_number(col)
+            if quantity is not None and quantity not in breaks:
+                breaks[quantity] = (order, col)
+        for quantity in sorted(breaks):
+            order, col = breaks[quantity]
+            self.qty_break_values.append(quantity)
+            self._qty_break_order.append(order)
+            self.qty_break_cols.append(col)
+
+    def shared_columns(self):
+        """
+        (numeric columns, text columns) that write_shared_catalog can move to the shared
+        file: prices, volumes and quantity breaks as arrays, specs, part numbers and text
+        prices as UTF-8 blobs. Categorical and mixed-type columns stay in the pickle.
+        """
+        if not self.df.columns.is_unique:
+            return [], []
+        numeric, text = [], []
+        for col, dtype in self.df.dtypes.items():
+            if isinstance(dtype, np.dtype) and (np.issubdtype(dtype, np.number) or dtype == np.bool_):
+                numeric.append(col)
+            elif dtype == object or isinstance(dtype, pd.StringDtype):
+                text.append(col)
+        return numeric, text
+
+    def __getstate__(self):
+        # Columns moved to a shared catalog file (see write_shared_catalog) are pickled as
+        # their location only; the rest of the frame is pickled as usual. A shared sheet's
+        # volume-table lookups are rebuilt by __setstate__ from the mapped columns instead.
+        state = dict(self.__dict__)
+        mapped = state.pop("_mapped_columns", None)
+        mapped_norm_specs = state.pop("_mapped_norm_specs", None)
+        if mapped:
+            state["df"] = (self.df.drop(columns=list(mapped)), list(self.df.columns),
+                           {col: _shared_array_location(array) if isinstance(array, np.memmap) else array
+                            for col, array in mapped.items()})
+            if self.is_volume_table:
+                for name in ("first_row_by_spec", "volume_prices", "qty_break_values", "qty_break_cols", "_qty_break_order"):
+                    state[name] = None
+        if mapped_norm_specs:
+            state["norm_specs"] = {col: mapped_norm_specs.get(col, norm_specs) for col, norm_specs in self.norm_specs.items()}
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state["df"], tuple):
+            rest, columns, shared = state["df"]
+            data = {}
+            for col in columns:
+                if col not in shared:
+                    data[col] = rest[col]
+                elif isinstance(shared[col], SharedStrings):
+                    data[col] = shared[col].series(rest.index)
+                else:
+                    data[col] = _map_shared_array(shared[col])
+            state["df"] = pd.DataFrame(data, index=rest.index, columns=columns, copy=False)
+        index = state["df"].index
+        state["norm_specs"] = {col: norm_specs.series(index, col) if isinstance(norm_specs, SharedStrings) else norm_specs
+                               for col, norm_specs in state["norm_specs"].items()}
+        self.__dict__.update(state)
+        if self.is_volume_table and self.volume_prices is None:
+            self.first_row_by_spec = {}
+            self.volume_prices = {}
+            self.qty_break_values = []
+            self.qty_break_cols = []
+            self._qty_break_order = []
+            self._compile_volume_table()
+
+    def closest_quantity_column(self, quote_volume):
+        """Quantity column (e.g. "5K") closest to quote_volume; ties go to the leftmost column."""
+        if not self.qty_break_values:
+            return None
+        pos = bisect.bisect_left(self.qty_break_values, quote_volume)
+        candidates = [p for p in (pos - 1, pos) if 0 <= p < len(self.qty_break_values)]
+        best = min(candidates, key=lambda p: (abs(self.qty_break_values[p] - quote_volume), self._qty_break_order[p]))
+        return self.qty_break_cols[best]
+
+
+class SpecCatalog:
+    """
+    Every spec sheet of a specs folder, parsed once per comparison run and shared by
+    all lookups (and by the worker processes of a parallel run).
+    """
+    def __init__(self, specs_folder, sheets):
+        self.specs_folder = specs_folder
+        self.sheets = sheets
+        self._sheets_by_name = {(sheet.file_name, sheet.sheet_name): sheet for sheet in sheets}
+        # Per sheet {spec column: SpecVectors} once the vector engine is enabled, else None
+        self.spec_vectors = None
+        # Distinct closest-spec candidates, built on first use by closest_spec_entries
+        self._closest_spec_entries = None
+
+    def get_sheet(self, file_name, sheet_name):
+        return self._sheets_by_name.get((file_name, sheet_name))
+
+    def closest_spec_entries(self):
+        """
+        The first spec column of every sheet collapsed to one entry per distinct spec text,
+        in order of first appearance: (spec text, normalized spec, [(sheet, row label), ...]).
+        The closest-spec confidence is computed from the original text, so rows only share
+        an entry when that text is identical.
+        """
+        if self._closest_spec_entries is None:
+            entries = {}
+            for sheet in self.sheets:
+                spec_col = sheet.spec_cols[0]
+                norm_specs = sheet.norm_specs[spec_col]
+                for idx, spec_val in sheet.df[spec_col].dropna().items():
+                    spec_text = str(spec_val)
+                    entry = entries.get(spec_text)
+                    if entry is None:
+                        entry = entries[spec_text] = (spec_text, norm_specs[idx], [])
+                    entry[2].append((sheet, idx))
+            self._closest_spec_entries = list(entries.values())
+        return self._closest_spec_entries
+
+    def enable_vector_engine(self):
+        """Builds the spec feature vectors so fuzzy and closest-spec scoring use the vector engine."""
+        if self.spec_vectors is None:
+            self.spec_vectors = [{col: SpecVectors(sheet.norm_specs[col]) for col in sheet.spec_cols}
+                                 for sheet in self.sheets]
+
+
+def is_spec_sheet_column(col):
+    """Whether any matcher reads this (stripped) spec sheet column: spec, part number, price, volume/MOQ or quantity break."""
+    col_lower = col.lower()
+    return ("spec" in col_lower
+            or bool(find_price_columns([col]))
+            or find_part_number_column([col]) is not None
+            or any(x in col_lower for x in ["moq", "volume", "qty", "quantity"])
+            or is_quantity_column(col))
+
+def compact_spec_column(series):
+    """
+    Smaller in-memory copy of a spec sheet column with the same values: float64 as
+    float32 when every value survives the round trip, and text columns that repeat
+    their values (units, MOQ labels, currencies) as categoricals.
+    """
+    if series.dtype == np.float64:
+        narrowed = series.astype(np.float32)
+        if np.array_equal(narrowed.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return narrowed
+        return series
+    if pd.api.types.is_string_dtype(series.dtype) and "spec" not in str(series.name).lower():
+        values = series.dropna().tolist()
+        # Only pure text: categories would merge values that compare equal, like True and 1
+        if values and len(set(values)) * 2 <= len(values) and all(isinstance(v, str) for v in values):
+            return series.astype("category")
+    return series
+
+def read_sheet_header(xls, sheet_name):
+    # nrows=0 makes the reader stop after the header row instead of loading the sheet
+    return [str(c).strip() for c in xls.parse(sheet_name, nrows=0).columns]
+
+def parse_spec_sheet(xls, sheet_name, header=None):
+    """
+    Parses one sheet of an open spec workbook with stripped column names. The header row
+    is read first (unless given) so only the columns the matchers use are loaded, then
+    compacted with compact_spec_column. Returns an empty frame when no column is relevant.
+    """
+    if header is None:
+        header = read_sheet_header(xls, sheet_name)
+    positions = [pos for pos, col in enumerate(header) if is_spec_sheet_column(col)]
+    if not positions:
+        return pd.DataFrame(columns=[])
+    df = xls.parse(sheet_name, usecols=positions)
+    columns = [header[pos] for pos in positions]
+    compacted = pd.concat([compact_spec_column(df.iloc[:, i]) for i in range(df.shape[1])], axis=1)
+    compacted.columns = columns
+    return compacted
+
+
+def load_spec_file(file_path):
+    """
+    Parses every sheet of one spec file that has a spec column.
+    Returns a list of SpecSheet objects, or None if the file could not be opened.
+    """
+    sheets, _ = _load_spec_file(file_path)
+    return sheets
+
+def _load_spec_file(file_path):
+    """
+    load_spec_file, also returning the names of the sheets skipped for lack of a spec
+    column. Every sheet's header row is probed first and cover, pivot or notes sheets
+    without a spec column are never parsed.
+    """
+    spec_file = os.path.basename(file_path)
+    try:
+        xls = open_spec_workbook(file_path)
+    except Exception:
+        if _PROFILE is not None:
+            _PROFILE.count("spec_files_unreadable")
+        return None, None
+
+    sheets = []
+    skipped = []
+    for sheet_name in xls.sheet_names:
         try:
-            if spec_file.endswith(".xlsb"):
-                xls = pd.ExcelFile(file_path, engine="pyxlsb")
-            else:
-                xls = pd.ExcelFile(file_path)
+            header = read_sheet_header(xls, sheet_name)
+            if not find_spec_columns(header):
+                skipped.append(sheet_name)
+                if _PROFILE is not None:
+                    _PROFILE.count("sheets_skipped_no_spec_column")
+                continue
+            df = parse_spec_sheet(xls, sheet_name, header)
         except Exception:
+            if _PROFILE is not None:
+                _PROFILE.count("sheets_unreadable")
             continue
 
-        for sheet_name in xls.sheet_names:
-            try:
-                df = xls.parse(sheet_name)
-                df.columns = [str(c).strip() for c in df.columns]
-            except Exception:
-                continue
+        sheet = SpecSheet(spec_file, sheet_name, df)
+        if sheet.spec_cols:
+            sheets.append(sheet)
+        else:
+            skipped.append(sheet_name)
+            if _PROFILE is not None:
+                _PROFILE.count("sheets_skipped_no_spec_column")
+    if _PROFILE is not None:
+        _PROFILE.count("spec_files_parsed")
+        _PROFILE.count("sheets_parsed", len(sheets))
+    return sheets, skipped
+
+
+# -------- Spec catalog cache --------
+# Parsed spec files are pickled to a local cache directory, one entry per spec file,
+# keyed by (path, size, mtime) so only new or changed files are parsed again.
+# Bump the version whenever the cached SpecSheet layout or the spec column detection
+# changes. Each entry also records the file's sheets that were skipped for lack of a
+# spec column.
+CATALOG_CACHE_VERSION = 4
+
+def default_catalog_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "Spec_Comparator", "catalog")
+
+def _catalog_cache_entry_path(cache_dir, file_path):
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest + ".pkl")
+
+def _spec_file_key(file_path):
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+def _read_catalog_cache_entry(entry_path, file_key):
+    # The cached sheets if the entry is for this file version, else None
+    try:
+        with open(entry_path, "rb") as f:
+            entry = pickle.load(f)
+        if entry.get("version") == CATALOG_CACHE_VERSION and entry.get("key") == file_key:
+            if _PROFILE is not None:
+                _PROFILE.count("spec_files_from_cache")
+            return entry["sheets"]
+    except Exception:
+        pass  # Missing, stale or unreadable entry: parse the file again
+    return None
 
-            # Accept any column containing "spec"
-            spec_cols = find_spec_columns(df.columns)
-            if not spec_cols:
-                continue
+def read_cached_spec_file(file_path, cache_dir):
+    """The file's cached sheets if they are up to date, else None (without parsing the file)."""
+    try:
+        file_key = _spec_file_key(file_path)
+    except OSError:
+        return None
+    return _read_catalog_cache_entry(_catalog_cache_entry_path(cache_dir, file_path), file_key)
 
-            price_cols = find_price_columns(df.columns)
-
-            matched_prices = []
-            matched_volumes = []
-            matched_mask = []
-
-            for _, row in quote_df.iterrows():
-                # For each quote row, search all quote spec columns for the best match in all spec columns of the spec file
-                price_found = None
-                vol_found = None
-                matched = False
-
-                # Detect if this is a "volume table" style spec file
-                has_volume_col = any("volume" in col.lower() for col in df.columns)
-                qty_cols = [col for col in df.columns if re.match(r"^\d+(\.\d+)?k$", col.strip().lower())]
-
-                if has_volume_col or qty_cols:
-                    # --- "Volume Table" style: require exact match on spec and volume ---
-                    for quote_spec_col in spec_col_candidates:
-                        quote_spec = normalize_spec_string(row[quote_spec_col])
-                        for spec_col_in_file in spec_cols:
-                            norm_specs = df[spec_col_in_file].astype(str).apply(normalize_spec_string)
-                            matches = df[norm_specs == quote_spec]
-                            if not matches.empty:
-                                # Try to match volume
-                                quote_volume = None
-                                # Try to get the quote's volume from the quote row (from any volume column)
-                                for vcol in quote_df.columns:
-                                    if "volume" in vcol.lower() and pd.notna(row[vcol]):
-                                        quote_volume = extract_quantity_number(row[vcol])
-                                        if quote_volume is not None:
-                                            break
-                                # Try to match volume columns with dates
-                                if has_volume_col and quote_volume is not None:
-                                    # Find volume columns (containing "volume")
-                                    volume_cols = [col for col in df.columns if "volume" in col.lower()]
-                                    for vol_col in volume_cols:
-                                        vol_matches = matches[matches[vol_col].apply(lambda x: extract_quantity_number(x) == quote_volume)]
-                                        if not vol_matches.empty:
-                                            # Find corresponding pricing column
-                                            # Look for a pricing column with similar name pattern
-                                            pricing_col = vol_col.replace("Volume", "pricing").replace("volume", "pricing")
-                                            if pricing_col in df.columns:
-                                                price_found = vol_matches.iloc[0][pricing_col]
-                                                vol_found = vol_matches.iloc[0][vol_col]
-                                                matched = True
-                                                break
-                                            else:
-                                                # Try to find any pricing column
-                                                price_cols_in_file = find_price_columns(df.columns)
-                                                if price_cols_in_file:
-                                                    price_found = vol_matches.iloc[0][price_cols_in_file[0]]
-                                                    vol_found = vol_matches.iloc[0][vol_col]
-                                                    matched = True
-                                                    break
-                                    if matched:
-                                        break
-                                # Try to match quantity columns (e.g., "1K", "5K")
-                                elif qty_cols and quote_volume is not None:
-                                    # Find the closest quantity column
-                                    qty_numbers = [(col, extract_quantity_number(col)) for col in qty_cols]
-                                    qty_numbers = [(col, num) for col, num in qty_numbers if num is not None]
-                                    if qty_numbers:
-                                        closest_col, _ = min(qty_numbers, key=lambda x: abs(x[1] - quote_volume))
-                                        try:
-                                            price_found = matches.iloc[0][closest_col]
-                                            vol_found = closest_col
-                                            matched = True
-                                            break
-                                        except:
-                                            continue
-                else:
-                    # --- Fuzzy matching as before ---
-                    best_score = 0
-                    best_row = None
-                    best_col = None
-                    best_quote_spec_val = None
-
-                    for quote_spec_col in spec_col_candidates:
-                        quote_spec = normalize_spec_string(row[quote_spec_col])
-                        for spec_col_in_file in spec_cols:
-                            norm_specs = df[spec_col_in_file].astype(str).apply(normalize_spec_string)
-                            for idx, spec_val in norm_specs.items():
-                                score = difflib.SequenceMatcher(None, quote_spec, spec_val).ratio()
-                                if score > best_score:
-                                    best_score = score
-                                    best_row = df.loc[idx]
-                                    best_col = spec_col_in_file
-                                    best_quote_spec_val = quote_spec
-
-                    if best_score > 0.85 and best_row is not None:
-                        for pcol in price_cols:
-                            try:
-                                price_found = float(best_row[pcol])
-                                break
-                            except:
-                                continue
-                        for vcol in best_row.index:
-                            if any(x in vcol.lower() for x in ["moq", "volume", "qty", "quantity"]):
-                                vol_found = best_row[vcol]
-                                break
-                        matched = True
-
-                matched_prices.append(price_found)
-                matched_volumes.append(vol_found)
-                matched_mask.append(matched)
-            if any(pd.notna(p) for p in matched_prices):
-                # Use file name without extension and sheet name for column naming
-                file_name_base = os.path.splitext(spec_file)[0]
-                matched_price_col = f"{file_name_base} - {sheet_name} Matched Price"
-                result_df[matched_price_col] = matched_prices
-                # Insert the volume column right after the matched price column
-                vol_col_name = f"{file_name_base} - {sheet_name} Volume"
-                col_list = list(result_df.columns)
-                price_idx = col_list.index(matched_price_col)
-                result_df.insert(price_idx + 1, vol_col_name, matched_volumes)
-                # Insert Cost Delta column after volume column
-                cost_delta_col_name = f"{file_name_base} - {sheet_name} Cost Delta"
-                # Find all quote price columns with month/year info
-                def norm_col_name(col):
-                    return re.sub(r'[^a-zA-Z0-9]', '', str(col)).lower()
-                price_cols_quote = [col for col in quote_df.columns if any(x in norm_col_name(col) for x in ["price", "cost", "pricing"])]
-                dated_cols = [(col, extract_date_from_col(col)) for col in price_cols_quote]
-                dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
-                if dated_cols:
-                    quote_price_col = max(dated_cols, key=lambda x: x[1])[0]
-                elif price_cols_quote:
-                    quote_price_col = price_cols_quote[0]
-                else:
-                    quote_price_col = None
-
-                cost_deltas = []
-                for i, price in enumerate(matched_prices):
-                    quote_price = None
-                    if quote_price_col:
-                        try:
-                            quote_price = float(quote_df.iloc[i][quote_price_col])
-                        except:
-                            quote_price = None
-                    sheet_price = None
-                    try:
-                        sheet_price = float(matched_prices[i])
-                    except:
-                        sheet_price = None
-                    if sheet_price is not None and quote_price is not None:
-                        cost_deltas.append(round(quote_price - sheet_price, 4))
-                    else:
-                        cost_deltas.append(None)
-                result_df.insert(price_idx + 2, cost_delta_col_name, cost_deltas)
-                added_columns.append(matched_price_col)
-                added_columns.append(vol_col_name)
-                added_columns.append(cost_delta_col_name)
+def load_spec_file_cached(file_path, cache_dir):
+    entry_path = _catalog_cache_entry_path(cache_dir, file_path)
+    try:
+        file_key = _spec_file_key(file_path)
+    except OSError:
+        return None
+
+    sheets = _read_catalog_cache_entry(entry_path, file_key)
+    if sheets is not None:
+        return sheets
+
+    sheets, skipped = _load_spec_file(file_path)
+    if sheets is None:
+        return None  # Don't cache files that could not be opened (e.g. locked by Excel)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temp file first so an interrupted run never leaves a truncated entry
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": CATALOG_CACHE_VERSION, "key": file_key, "sheets": sheets, "skipped": skipped},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+    except Exception:
+        pass  # Caching is best effort
+    return sheets
+
+
+def _load_spec_files_chunk(file_paths, cache_dir=None):
+    # Parses spec files in a worker process of a parallel catalog load
+    return [load_spec_file_cached(file_path, cache_dir) if cache_dir else load_spec_file(file_path)
+            for file_path in file_paths]
+
+def _load_spec_files_parallel(file_paths, cache_dir, progress_label, cancel_event, workers):
+    """
+    Sheets of each file (None if unreadable), in file_paths order. Files not served from
+    the cache are parsed by a process pool, one file per task.
+    """
+    file_sheets = [None] * len(file_paths)
+    pending = []
+    for file_idx, file_path in enumerate(file_paths):
+        cached = read_cached_spec_file(file_path, cache_dir) if cache_dir else None
+        if cached is None:
+            pending.append(file_idx)
+        else:
+            file_sheets[file_idx] = cached
+    if not pending:
+        return file_sheets
+
+    # Worker processes count into their own profiles; merge them into the run's
+    task_func = _load_spec_files_chunk if _PROFILE is None else functools.partial(_profiled_chunk, _load_spec_files_chunk)
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+        futures = {executor.submit(task_func, [file_paths[file_idx]], cache_dir): file_idx for file_idx in pending}
+        try:
+            for files_done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if _PROFILE is not None:
+                    result, counters, distributions = result
+                    _PROFILE.merge(counters, distributions)
+                file_sheets[futures[future]] = result[0]
+                if progress_label is not None:
+                    report_progress(progress_label, f"Loading spec files ({files_done}/{len(pending)} parsed by "
+                                                    f"{min(workers, len(pending))} workers): "
+                                                    f"{os.path.basename(file_paths[futures[future]])}")
+                check_cancelled(cancel_event)
+        except BaseException:
+            # Drop the files still queued so the pool shuts down without parsing them
+            for future in futures:
+                future.cancel()
+            raise
+    return file_sheets
+
+def load_spec_catalog(specs_folder, cache_dir=None, progress_label=None, cancel_event=None, workers=1):
+    """
+    Parses the specs folder into a SpecCatalog. With a cache_dir, unchanged spec files
+    are loaded from the on-disk cache instead of being parsed again. With workers > 1
+    the other files are parsed in parallel; their sheets are still added in
+    list_spec_files order, so the catalog (and every match) is the same as a serial load.
+    """
+    sheets = []
+    spec_files = list_spec_files(specs_folder)
+    file_paths = [os.path.join(specs_folder, spec_file) for spec_file in spec_files]
+    if workers and workers > 1 and len(file_paths) > 1:
+        check_cancelled(cancel_event)
+        for file_sheets in _load_spec_files_parallel(file_paths, cache_dir, progress_label, cancel_event, workers):
+            if file_sheets:
+                sheets.extend(file_sheets)
+        return SpecCatalog(specs_folder, sheets)
+
+    for file_idx, spec_file in enumerate(spec_files):
+        check_cancelled(cancel_event)
+        if progress_label is not None:
+            report_progress(progress_label, f"Loading spec files ({file_idx + 1}/{len(spec_files)}, "
+                                            f"{len(sheets)} sheets so far): {spec_file}")
+        file_path = file_paths[file_idx]
+        if cache_dir:
+            file_sheets = load_spec_file_cached(file_path, cache_dir)
+        else:
+            file_sheets = load_spec_file(file_path)
+        if file_sheets:
+            sheets.extend(file_sheets)
+    return SpecCatalog(specs_folder, sheets)
+
+
+# -------- Match result cache --------
+# Results of the expensive searches (exact/fuzzy matching per distinct normalized quote
+# spec, closest-spec search per distinct quote spec) are kept in a local SQLite file
+# across runs. Entries are keyed by a fingerprint of the specs folder, so changing,
+# adding or removing any spec file starts a fresh set of entries and drops the old one.
+# The fingerprint also covers the sheets that actually loaded: match results refer to
+# sheets by catalog position, which shifts when a file fails to open on one run only.
+# The cheap volume-dependent lookups are not cached. Bump the version whenever the
+# matching or scoring logic changes.
+MATCH_CACHE_VERSION = 2
+MATCH_CACHE_FILE = "match_results.sqlite"
+
+def catalog_fingerprint(specs_folder, match_engine="difflib"):
+    """Hash of every spec file's name, size and mtime (in catalog order) plus the matching settings."""
+    digest = hashlib.sha1(f"{MATCH_CACHE_VERSION}|{CATALOG_CACHE_VERSION}|{match_engine}".encode("utf-8"))
+    for spec_file in list_spec_files(specs_folder):
+        try:
+            stat = os.stat(os.path.join(specs_folder, spec_file))
+            digest.update(f"|{spec_file}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            digest.update(f"|{spec_file}|missing".encode("utf-8"))
+    return digest.hexdigest()
+
+def loaded_catalog_fingerprint(fingerprint, catalog):
+    """catalog_fingerprint extended with the (file, sheet) pairs of the loaded catalog, in catalog order."""
+    digest = hashlib.sha1(fingerprint.encode("utf-8"))
+    for sheet in catalog.sheets:
+        digest.update(f"|{sheet.file_name}|{sheet.sheet_name}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MatchResultCache:
+    """Cached search results of one specs folder version, as {kind: {key: result}} lookups."""
+    def __init__(self, db_path, specs_folder, fingerprint):
+        self.fingerprint = fingerprint
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS catalogs (folder TEXT PRIMARY KEY, fingerprint TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS results (fingerprint TEXT, kind TEXT, key BLOB, value BLOB, "
+                          "PRIMARY KEY (fingerprint, kind, key))")
+        folder = os.path.abspath(specs_folder)
+        row = self.conn.execute("SELECT fingerprint FROM catalogs WHERE folder = ?", (folder,)).fetchone()
+        if row is None or row[0] != fingerprint:
+            # The folder changed since its results were cached: drop them
+            if row is not None:
+                self.conn.execute("DELETE FROM results WHERE fingerprint = ?", (row[0],))
+            self.conn.execute("INSERT OR REPLACE INTO catalogs VALUES (?, ?)", (folder, fingerprint))
+            self.conn.commit()
+
+    @staticmethod
+    def _key(key):
+        return pickle.dumps(key, protocol=4)
+
+    def get_many(self, kind, keys):
+        """{key: cached result} for the keys that are cached."""
+        found = {}
+        for key in keys:
+            row = self.conn.execute("SELECT value FROM results WHERE fingerprint = ? AND kind = ? AND key = ?",
+                                    (self.fingerprint, kind, self._key(key))).fetchone()
+            if row is not None:
+                found[key] = pickle.loads(row[0])
+        if _PROFILE is not None:
+            _PROFILE.count(f"{kind}.cache_hits", len(found))
+        return found
+
+    def put_many(self, kind, results):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            [(self.fingerprint, kind, self._key(key), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+             for key, result in results.items()])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+@contextlib.contextmanager
+def open_match_cache(cache_dir, catalog, fingerprint, in_memory=False):
+    """
+    Yields the MatchResultCache kept in cache_dir for the catalog_fingerprint taken before
+    the catalog was loaded (combined with the sheets that loaded), or None without a
+    cache_dir or if it can't be opened.
+    in_memory falls back to a cache that only lives for the block (batch runs without
+    a cache_dir, so a spec repeated across quotes is still searched once).
+    """
+    match_cache = None
+    try:
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            match_cache = MatchResultCache(os.path.join(cache_dir, MATCH_CACHE_FILE), catalog.specs_folder,
+                                           loaded_catalog_fingerprint(fingerprint, catalog))
+        elif in_memory:
+            match_cache = MatchResultCache(":memory:", catalog.specs_folder, fingerprint or "")
+    except (OSError, sqlite3.Error):
+        match_cache = None  # Caching is best effort
+    try:
+        yield match_cache
+    finally:
+        if match_cache is not None:
+            match_cache.close()
+
+
+def cached_search(match_cache, kind, chunk_func, keys, catalog, executor=None, workers=1, on_chunk_done=None):
+    """
+    {key: result} of chunk_func over keys, serving the keys already in match_cache and
+    adding the newly searched ones to it.
+    """
+    results = match_cache.get_many(kind, keys) if match_cache is not None else {}
+    missing = [key for key in keys if key not in results]
+    searched = dict(zip(missing, map_row_chunks(chunk_func, missing, catalog, executor, workers, on_chunk_done)))
+    if match_cache is not None and searched:
+        try:
+            match_cache.put_many(kind, searched)
+        except sqlite3.Error:
+            pass  # Caching is best effort
+    results.update(searched)
+    return results
+
+
+def find_quote_volumes(quote_df):
+    """
+    Each quote row's volume: the first parseable value of any column with 'volume' in its
+    name. Every volume column is parsed once for the whole quote.
+    """
+    volumes = [None] * len(quote_df)
+    for vcol in quote_df.columns:
+        if "volume" not in vcol.lower():
+            continue
+        column = quote_df[vcol]
+        present = column.notna().tolist()
+        for i, (has_value, quantity) in enumerate(zip(present, parse_quantity_column(column))):
+            if volumes[i] is None and has_value and quantity is not None:
+                volumes[i] = quantity
+    return volumes
+
+
+def _match_row_in_sheet(sheet, quote_specs, quote_volume, spec_vectors=None):
+    df = sheet.df
+    spec_cols = sheet.spec_cols
+    price_cols = sheet.price_cols
+    price_found = None
+    vol_found = None
+    match_score = None
+
+    if sheet.is_volume_table:
+        # --- "Volume Table" style: require exact match on spec and volume ---
+        # Later quote spec columns that match override earlier ones
+        for quote_spec_val in quote_specs:
+            quote_spec = normalize_spec_string(quote_spec_val)
+            for spec_col_in_file in spec_cols:
+                if _PROFILE is not None:
+                    _PROFILE.count("match.volume_table_lookups")
+                first_row = sheet.first_row_by_spec[spec_col_in_file].get(quote_spec)
+                if first_row is None:
+                    continue
+                # Try to match volume columns with dates
+                if sheet.volume_cols and quote_volume is not None:
+                    volume_match = sheet.volume_prices[spec_col_in_file].get((quote_spec, quote_volume))
+                    if volume_match is not None:
+                        price_found, vol_found = volume_match
+                        match_score = 1.0
+                        break
+                # Try to match quantity columns (e.g., "1K", "5K")
+                elif sheet.qty_cols and quote_volume is not None:
+                    # Find the closest quantity column
+                    closest_col = sheet.closest_quantity_column(quote_volume)
+                    if closest_col is not None:
+                        price_found = df.iloc[first_row][closest_col]
+                        vol_found = closest_col
+                        match_score = 1.0
+                        break
+    else:
+        # --- Fuzzy matching as before ---
+        best_score = 0
+        best_row = None
+
+        for quote_spec_val in quote_specs:
+            quote_spec = normalize_spec_string(quote_spec_val)
+            for spec_col_in_file in spec_cols:
+                norm_specs = sheet.norm_specs[spec_col_in_file]
+                if spec_vectors is not None:
+                    if _PROFILE is not None:
+                        _PROFILE.count("match.vector_rows_scored", len(norm_specs))
+                    scores = spec_vectors[spec_col_in_file].similarity(quote_spec)
+                    # argmax keeps the first of equal scores, as the row-by-row scan does
+                    pos = int(np.argmax(scores)) if len(scores) else -1
+                    if pos >= 0 and scores[pos] > best_score:
+                        best_score = float(scores[pos])
+                        best_row = df.loc[norm_specs.index[pos]]
+                    continue
+                if _PROFILE is not None:
+                    _PROFILE.count("match.sequence_matcher_ratio", len(norm_specs))
+                for idx, spec_val in norm_specs.items():
+                    score = difflib.SequenceMatcher(None, quote_spec, spec_val).ratio()
+                    if score > best_score:
+                        best_score = score
+                        best_row = df.loc[idx]
+
+        threshold = VECTOR_MATCH_THRESHOLD if spec_vectors is not None else 0.85
+        if best_score > threshold and best_row is not None:
+            match_score = best_score
+            for pcol in price_cols:
+                try:
+                    price_found = float(best_row[pcol])
+                    break
+                except:
+                    continue
+            for vcol in best_row.index:
+                if any(x in vcol.lower() for x in ["moq", "volume", "qty", "quantity"]):
+                    vol_found = best_row[vcol]
+                    break
+
+    return price_found, vol_found, match_score
+
+
+def match_quote_row(quote_specs, quote_volume, catalog, volume_tables=None):
+    """
+    Matches one quote row against every sheet of the catalog.
+    quote_specs holds the row's values from each quote spec column. Returns a dict of
+    catalog sheet index -> (matched price, matched volume, score) for the sheets that
+    matched; the score is 1.0 for exact volume-table matches.
+    volume_tables=True/False only matches the volume-table sheets / the other sheets;
+    quote_volume is only used by volume-table sheets.
+    """
+    scored_counter = "match.sequence_matcher_ratio" if catalog.spec_vectors is None else "match.vector_rows_scored"
+    if _PROFILE is not None:
+        scored_before = _PROFILE.counters.get(scored_counter, 0)
+    row_matches = {}
+    for sheet_idx, sheet in enumerate(catalog.sheets):
+        if volume_tables is not None and sheet.is_volume_table != volume_tables:
+            continue
+        spec_vectors = catalog.spec_vectors[sheet_idx] if catalog.spec_vectors is not None else None
+        price_found, vol_found, match_score = _match_row_in_sheet(sheet, quote_specs, quote_volume, spec_vectors)
+        if price_found is not None or vol_found is not None:
+            row_matches[sheet_idx] = (price_found, vol_found, match_score)
+    if _PROFILE is not None and volume_tables is not True:
+        _PROFILE.observe("match.spec_rows_scored",
+                         _PROFILE.counters.get(scored_counter, 0) - scored_before)
+    return row_matches
+
+
+# -------- Parallel matching --------
+# Quote rows are independent of each other, so they are sharded across a process pool.
+# The catalog is handed to each worker once through the pool initializer (inherited on
+# fork, pickled once per worker on spawn) instead of being sent with every task.
+_WORKER_CATALOG = None
+
+def _init_match_worker(catalog):
+    global _WORKER_CATALOG
+    if isinstance(catalog, str):
+        # Path of the catalog written once by write_shared_catalog
+        with open(catalog, "rb") as f:
+            catalog = pickle.load(f)
+    _WORKER_CATALOG = catalog
+
+def _match_specs_chunk(spec_tuples, catalog=None):
+    # Search of the sheets that don't depend on the quote volume, once per distinct spec
+    if catalog is None:
+        catalog = _WORKER_CATALOG
+    return [match_quote_row(quote_specs, None, catalog, volume_tables=False) for quote_specs in spec_tuples]
+
+def _closest_specs_chunk(quote_specs, catalog=None):
+    if catalog is None:
+        catalog = _WORKER_CATALOG
+    return [find_closest_spec_and_costs(quote_spec, catalog.specs_folder, catalog=catalog) for quote_spec in quote_specs]
+
+def _closest_prices_chunk(rows, catalog=None):
+    if catalog is None:
+        catalog = _WORKER_CATALOG
+    return [resolve_closest_price(closest, quote_volume, catalog) for closest, quote_volume in rows]
+
+def _profiled_chunk(chunk_func, items, *args):
+    # Runs chunk_func(items, *args) in a worker under a fresh worker-local profile and hands
+    # its counters back for merging (quote row chunks as well as spec files to load)
+    global _PROFILE
+    profile = MatchProfile()
+    calls_before = _normalization_call_counts()
+    _PROFILE = profile
+    try:
+        results = chunk_func(items, *args)
+    finally:
+        _PROFILE = None
+    profile.add_normalization_calls(calls_before)
+    return results, profile.counters, profile.distributions
+
+def _write_shared_arrays(arrays, path):
+    """Writes arrays back to back into path and returns read-only memory maps of them."""
+    offsets = []
+    position = 0
+    with open(path, "wb") as f:
+        for array in arrays:
+            padding = -position % 64  # Keeps every array aligned for vectorized reads
+            f.write(b"\0" * padding)
+            position += padding
+            offsets.append(position)
+            np.ascontiguousarray(array).tofile(f)
+            position += array.nbytes
+    # An empty array can't be mapped and costs nothing to pickle
+    return [np.memmap(path, dtype=array.dtype, mode="r", offset=offset, shape=array.shape) if array.size else array
+            for array, offset in zip(arrays, offsets)]
+
+def write_shared_catalog(catalog, shared_dir):
+    """
+    Pickles the catalog once into shared_dir for spawned match workers and returns its path.
+    Its columns go to a separate file that every worker memory-maps read-only instead of
+    unpickling them: numeric ones (prices, volumes, quantity breaks and, with the vector
+    engine, the spec vectors) as arrays, text ones (specs, normalized specs, part numbers,
+    text prices) as an offsets array plus a UTF-8 bytes blob per column. Each worker still
+    decodes the text into its own strings and rebuilds the volume-table lookups from it.
+    """
+    sheet_columns = [sheet.shared_columns() for sheet in catalog.sheets]
+    arrays = []
+    # Per sheet: [(col, dtype, number of arrays)] for its df columns, then for its normalized specs
+    layouts = []
+    for sheet, (numeric_cols, text_cols) in zip(catalog.sheets, sheet_columns):
+        column_layout, norm_layout = [], []
+        for col in numeric_cols:
+            arrays.append(sheet.df[col].to_numpy())
+            column_layout.append((col, None, 1))
+        for col in text_cols:
+            encoded = _encode_shared_strings(sheet.df[col].tolist())
+            if encoded is not None:
+                arrays += encoded
+                column_layout.append((col, sheet.df[col].dtype, len(encoded)))
+        for col, norm_specs in sheet.norm_specs.items():
+            encoded = _encode_shared_strings(norm_specs.tolist())
+            if encoded is not None:
+                arrays += encoded
+                norm_layout.append((col, norm_specs.dtype, len(encoded)))
+        layouts.append((column_layout, norm_layout))
+    vectors = []
+    if catalog.spec_vectors is not None:
+        vectors = [vec for sheet_vectors in catalog.spec_vectors for vec in sheet_vectors.values()]
+        arrays += [getattr(vec, name) for vec in vectors for name in SpecVectors.ARRAYS]
+    mapped = iter(_write_shared_arrays(arrays, os.path.join(shared_dir, "catalog_arrays.bin")))
+
+    def shared_values(dtype, n_arrays):
+        values = [next(mapped) for _ in range(n_arrays)]
+        return values[0] if dtype is None else SharedStrings(*values, dtype)
+
+    shared_sheets = []
+    for sheet, (column_layout, norm_layout) in zip(catalog.sheets, layouts):
+        shared_sheet = copy.copy(sheet)
+        columns = {col: shared_values(dtype, n_arrays) for col, dtype, n_arrays in column_layout}
+        # Empty numeric columns aren't mapped (see _write_shared_arrays) and stay in the pickle
+        shared_sheet._mapped_columns = {col: values for col, values in columns.items()
+                                        if isinstance(values, (np.memmap, SharedStrings))}
+        shared_sheet._mapped_norm_specs = {col: shared_values(dtype, n_arrays) for col, dtype, n_arrays in norm_layout}
+        shared_sheets.append(shared_sheet)
+    shared = SpecCatalog(catalog.specs_folder, shared_sheets)
+    if catalog.spec_vectors is not None:
+        shared.spec_vectors = []
+        for sheet_vectors in catalog.spec_vectors:
+            shared_vectors = {}
+            for col, vec in sheet_vectors.items():
+                shared_vectors[col] = copy.copy(vec)
+                for name in SpecVectors.ARRAYS:
+                    setattr(shared_vectors[col], name, next(mapped))
+            shared.spec_vectors.append(shared_vectors)
+    catalog_path = os.path.join(shared_dir, "catalog.pickle")
+    with open(catalog_path, "wb") as f:
+        pickle.dump(shared, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return catalog_path
+
+@contextlib.contextmanager
+def match_executor(catalog, workers):
+    """
+    Yields a process pool primed with the catalog when workers > 1, otherwise None so
+    matching runs in-process. Forked workers share the parent's catalog pages as they are;
+    spawned ones (Windows, macOS) load the catalog from write_shared_catalog's file.
+    """
+    if not workers or workers <= 1:
+        yield None
+        return
+    if multiprocessing.get_start_method() == "fork":
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker, initargs=(catalog,)) as executor:
+            yield executor
+        return
+    shared_dir = tempfile.mkdtemp(prefix="spec_catalog_")
+    try:
+        with profile_phase("share_catalog"):
+            catalog_path = write_shared_catalog(catalog, shared_dir)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker, initargs=(catalog_path,)) as executor:
+            yield executor
+    finally:
+        # Best effort: a file still mapped by a worker can't be removed on Windows
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+# Serial runs with progress reporting are split into chunks of this many rows
+PROGRESS_CHUNK_ROWS = 100
+
+def map_row_chunks(chunk_func, rows, catalog, executor=None, workers=1, on_chunk_done=None):
+    """
+    Runs chunk_func over rows, in original row order, serially or across the executor's workers.
+    on_chunk_done(rows_done) is called after each chunk; an exception raised by it (e.g. a
+    cancelled run) stops the remaining chunks.
+    """
+    if not rows or (executor is None and on_chunk_done is None):
+        return chunk_func(rows, catalog)
+    if executor is None:
+        chunk_size = PROGRESS_CHUNK_ROWS
+    else:
+        # A few chunks per worker keeps the pool busy when some rows are slower than others
+        chunk_size = max(1, math.ceil(len(rows) / (max(workers, 1) * 4)))
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    results = []
+    if executor is None:
+        for chunk in chunks:
+            results.extend(chunk_func(chunk, catalog))
+            on_chunk_done(len(results))
+        return results
+
+    # Worker processes count into their own profiles; merge them into the run's
+    task_func = chunk_func if _PROFILE is None else functools.partial(_profiled_chunk, chunk_func)
+    futures = [executor.submit(task_func, chunk) for chunk in chunks]
+    try:
+        for future in futures:
+            chunk_result = future.result()
+            if _PROFILE is not None:
+                chunk_result, counters, distributions = chunk_result
+                _PROFILE.merge(counters, distributions)
+            results.extend(chunk_result)
+            if on_chunk_done is not None:
+                on_chunk_done(len(results))
+    except BaseException:
+        # Drop the chunks still queued so the pool shuts down without finishing them
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def find_quote_price_column(columns):
+    """The quote's most recent dated price column (e.g. "May'25 Price"), else its first price column."""
+    def norm_col_name(col):
+        return re.sub(r'[^a-zA-Z0-9]', '', str(col)).lower()
+    price_cols = [col for col in columns if any(x in norm_col_name(col) for x in ["price", "cost", "pricing"])]
+    dated_cols = [(col, extract_date_from_col(col)) for col in price_cols]
+    dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
+    if dated_cols:
+        return max(dated_cols, key=lambda x: x[1])[0]
+    if price_cols:
+        return price_cols[0]
+    return None
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except Exception:
+        return np.nan
+
+def to_float_array(values):
+    """float(value) for each value as a NumPy array, NaN where that fails. Distinct values are converted once."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    codes, uniques = pd.factorize(values)
+    # Missing values get code -1, which picks the trailing NaN
+    return np.array([_float_or_nan(value) for value in uniques] + [np.nan])[codes]
+
+def quote_price_array(quote_df):
+    quote_price_col = find_quote_price_column(quote_df.columns)
+    if quote_price_col is None:
+        return np.full(len(quote_df), np.nan)
+    return to_float_array(quote_df[quote_price_col])
+
+def cost_deltas(quote_prices, other_prices):
+    """Quote price minus the other price per row, rounded to 4 places; NaN where either is missing."""
+    deltas = quote_prices - to_float_array(other_prices)
+    # Python's round rather than np.round: np.round scales by 10**4 first, which rounds
+    # half-way values of 5-decimal prices to a different 4th decimal
+    return np.array([round(delta, 4) for delta in deltas.tolist()], dtype=float)
+
+
+# -------- Match store --------
+# Matches are kept as a long table with one row per (quote row, spec sheet) match
+# instead of three mostly-empty columns per spec sheet. The wide Matched Parts layout
+# is derived from it only when the output is written.
+MATCH_COLUMNS = ["Quote Row", "Spec File", "Spec Sheet", "Matched Price", "Matched Volume", "Cost Delta", "Score"]
+MATCH_EXPORT_FORMATS = ("csv", "parquet")
+
+def quote_spec_columns(columns):
+    # Every quote column mentioning "spec" is searched for each row
+    spec_col_candidates = [col for col in columns if "spec" in col.strip().lower()]
+    if not spec_col_candidates:
+        raise KeyError("No spec column found in quote_df. Expected a column containing 'spec'.")
+    return spec_col_candidates
+
+def move_columns_to_end(df, columns):
+    moved = [col for col in columns if col in df.columns]
+    return df[[col for col in df.columns if col not in moved] + moved]
+
+def match_quote_frame(quote_df, catalog, executor=None, workers=1, progress_label=None, cancel_event=None, match_cache=None):
+    """
+    Matches every quote row against the catalog and returns the long match table
+    (MATCH_COLUMNS). Quote Row is the row's position in quote_df; the Score is the fuzzy
+    similarity, or 1.0 for exact volume-table matches.
+    Quotes repeat specs over many lines, so the search runs once per distinct normalized
+    spec and is fanned back out; only the volume-table lookups depend on each row's volume.
+    With a match_cache, specs searched by an earlier run against the same catalog are
+    served from it.
+    """
+    spec_col_candidates = quote_spec_columns(quote_df.columns)
+    quote_specs = list(zip(*(normalize_spec_series(quote_df[col]).tolist() for col in spec_col_candidates)))
+    volumes = find_quote_volumes(quote_df)
+    unique_specs = list(dict.fromkeys(quote_specs))
+    if _PROFILE is not None:
+        _PROFILE.count("match.unique_quote_specs", len(unique_specs))
+    report_progress(progress_label, f"Matching {len(unique_specs)} distinct specs of {len(quote_df)} quote rows...")
+    spec_matches = cached_search(match_cache, "match", _match_specs_chunk, unique_specs, catalog, executor, workers,
+                                 row_progress(progress_label, cancel_event, "Matching distinct specs", len(unique_specs)))
+
+    volume_matches = {}
+    if any(sheet.is_volume_table for sheet in catalog.sheets):
+        for key in dict.fromkeys(zip(quote_specs, volumes)):
+            volume_matches[key] = match_quote_row(key[0], key[1], catalog, volume_tables=True)
+    row_matches = []
+    for key in zip(quote_specs, volumes):
+        matches = dict(spec_matches[key[0]])
+        matches.update(volume_matches.get(key, {}))
+        row_matches.append({sheet_idx: matches[sheet_idx] for sheet_idx in sorted(matches)})
+
+    records = []
+    for quote_row, matches in enumerate(row_matches):
+        for sheet_idx, (price, volume, score) in matches.items():
+            sheet = catalog.sheets[sheet_idx]
+            records.append((quote_row, sheet.file_name, sheet.sheet_name, price, volume, score))
+    matches = pd.DataFrame(records, columns=[col for col in MATCH_COLUMNS if col != "Cost Delta"])
+    matches["Quote Row"] = matches["Quote Row"].astype(int)
+    # Volumes mix numbers and labels like "5K"; keep them as matched, not coerced to float
+    matches["Matched Volume"] = pd.Series([record[4] for record in records], dtype=object)
+
+    # Quote prices from the most recent price column, converted once for every match
+    quote_prices = quote_price_array(quote_df)
+    matches.insert(MATCH_COLUMNS.index("Cost Delta"), "Cost Delta",
+                   cost_deltas(quote_prices[matches["Quote Row"].to_numpy()], matches["Matched Price"]))
+    return matches
+
+def priced_sheets(matches):
+    """(file, sheet) pairs that matched a price for at least one row; only these get output columns."""
+    priced = matches[matches["Matched Price"].notna()]
+    return set(zip(priced["Spec File"], priced["Spec Sheet"]))
+
+def matched_quote_rows(matches, priced=None):
+    """
+    Sorted positions of the quote rows with a matched price or volume on a priced sheet.
+    priced defaults to priced_sheets(matches); pass the whole quote's when matches only
+    covers one chunk of it.
+    """
+    if priced is None:
+        priced = priced_sheets(matches)
+    on_priced_sheet = [key in priced for key in zip(matches["Spec File"], matches["Spec Sheet"])]
+    found = matches["Matched Price"].notna() | matches["Matched Volume"].notna()
+    return np.unique(matches.loc[found & np.array(on_priced_sheet, dtype=bool), "Quote Row"].to_numpy(dtype=int))
+
+def sheet_match_columns(file_name, sheet_name):
+    # Use file name without extension and sheet name for column naming
+    file_name_base = os.path.splitext(file_name)[0]
+    return [f"{file_name_base} - {sheet_name} {suffix}" for suffix in ("Matched Price", "Volume", "Cost Delta")]
+
+def widen_matches(quote_df, matches, catalog, row_positions=None, priced=None):
+    """
+    Builds the wide Matched Parts view: the quote columns, then Matched Price / Volume /
+    Cost Delta columns for each priced sheet in catalog order, then Remark and the quote
+    spec columns. row_positions are the Quote Row values of quote_df's rows (sorted),
+    by default 0..len(quote_df)-1. priced is as for matched_quote_rows; sheets without
+    a match among these rows get no columns. Returns (result_df, added_columns).
+    """
+    n_rows = len(quote_df)
+    if row_positions is None:
+        row_positions = np.arange(n_rows)
+    matches = matches[matches["Quote Row"].isin(row_positions)]
+    positions = np.searchsorted(row_positions, matches["Quote Row"].to_numpy(dtype=int))
+    if priced is None:
+        priced = priced_sheets(matches)
+    groups = {key: idx for key, idx in matches.groupby(["Spec File", "Spec Sheet"], sort=False).indices.items()}
+
+    added = {}
+    for sheet in catalog.sheets:
+        key = (sheet.file_name, sheet.sheet_name)
+        if key not in priced or key not in groups:
+            continue
+        idx = groups[key]
+        group_positions = positions[idx].tolist()
+        prices = [None] * n_rows
+        volumes = [None] * n_rows
+        deltas = np.full(n_rows, np.nan)
+        for pos, price, volume in zip(group_positions, matches["Matched Price"].iloc[idx].tolist(), matches["Matched Volume"].iloc[idx].tolist()):
+            prices[pos] = price
+            volumes[pos] = volume
+        deltas[positions[idx]] = matches["Cost Delta"].to_numpy(dtype=float)[idx]
+        price_col, vol_col, delta_col = sheet_match_columns(*key)
+        added[price_col] = prices
+        added[vol_col] = volumes
+        added[delta_col] = deltas
 
     # Move 'Remark' and any spec columns to end
-    for col in ["Remark"] + spec_col_candidates:
-        if col in result_df.columns:
-            result_df = result_df[[c for c in result_df.columns if c != col] + [col]]
+    moved_cols = [col for col in ["Remark"] + quote_spec_columns(quote_df.columns) if col in quote_df.columns]
+    front_cols = [col for col in quote_df.columns if col not in moved_cols]
+    result_df = pd.concat(
+        [quote_df[front_cols], pd.DataFrame(added, index=quote_df.index), quote_df[moved_cols]], axis=1)
+    return result_df, list(added)
+
+def match_specs_and_append_prices(quote_df, specs_folder, catalog=None, executor=None, workers=1):
+    """Matches the quote and returns it in the wide layout: (result_df, added_columns)."""
+    if catalog is None:
+        catalog = load_spec_catalog(specs_folder)
+    matches = match_quote_frame(quote_df, catalog, executor=executor, workers=workers)
+    return widen_matches(quote_df, matches, catalog)
+
+def export_matches(matches, path, export_format=None):
+    """Writes the long match table for downstream analysis as CSV or Parquet (needs pyarrow or fastparquet)."""
+    export_format = export_format or ("parquet" if path.lower().endswith(".parquet") else "csv")
+    if export_format == "parquet":
+        table = matches.copy()
+        # Parquet needs one type per column, but prices can be "TBD" and volumes labels like "5K":
+        # keep the column numeric and put the values that aren't numbers in a "<col> Text" column
+        for col in ("Matched Price", "Matched Volume"):
+            if not pd.api.types.is_numeric_dtype(table[col]):
+                numeric = pd.to_numeric(table[col], errors="coerce")
+                text = [None if pd.isna(v) or not pd.isna(n) else str(v)
+                        for v, n in zip(table[col].tolist(), numeric.tolist())]
+                table[col] = numeric
+                table.insert(table.columns.get_loc(col) + 1, f"{col} Text", pd.Series(text, index=table.index, dtype=object))
+        table.to_parquet(path, index=False)
+    else:
+        matches.to_csv(path, index=False, encoding="utf-8-sig")
 
-    return result_df, added_columns
+def match_export_path(output_path, export_format):
+    return os.path.splitext(output_path)[0] + f"_matches.{export_format}"
 
 def bold_columns(ws, header, original_cols, extra_bold_cols=None):
     from openpyxl.styles import Font
@@ -331,22 +1622,30 @@ def bold_columns(ws, header, original_cols, extra_bold_cols=None):
         ws.cell(row=1, column=idx+1).font = bold_font
 
 def highlight_prices(file_path, sheet_name, extra_quote_price_keywords=None):
-
+    from openpyxl import load_workbook
     wb = load_workbook(file_path)
-    ws = wb[sheet_name]
+    highlight_price_cells(wb[sheet_name], extra_quote_price_keywords)
+    wb.save(file_path)
 
-    green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")   # Lowest
-    red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")     # Highest
-    yellow_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")  # Tie
-    blue_fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")    # Medium
+# Fill colors for highlight_price_cells
+PRICE_HIGHLIGHT_COLORS = {
+    "lowest": "C6EFCE",   # Green
+    "highest": "FFC7CE",  # Red
+    "tie": "FFEB9C",      # Yellow
+    "medium": "BDD7EE",   # Blue
+}
 
-    header = [str(cell.value).strip() for cell in ws[1]]
+def price_highlight_fills():
+    from openpyxl.styles import PatternFill
+    return {name: PatternFill(start_color=color, end_color=color, fill_type="solid") for name, color in PRICE_HIGHLIGHT_COLORS.items()}
 
+def find_highlight_columns(header, extra_quote_price_keywords=None):
+    """0-based indices of the columns whose values take part in price highlighting."""
     price_col_indices = set()
     if extra_quote_price_keywords:
         for i, h in enumerate(header):
             if any(k.lower() in h.lower() for k in extra_quote_price_keywords):
-                price_col_indices.add(i + 1)
+                price_col_indices.add(i)
 
     # Include sheet price columns (skip identifiers and volume columns)
     skip_keywords = ["Item", "HPPart#", "Type", "Remark", "SPECs"]
@@ -358,47 +1657,128 @@ def highlight_prices(file_path, sheet_name, extra_quote_price_keywords=None):
             and "cost delta" not in h.lower()
             and "confidence" not in h.lower()
         ):
-            price_col_indices.add(i + 1)
+            price_col_indices.add(i)
 
-    price_col_indices = sorted(price_col_indices)
+    return sorted(price_col_indices)
 
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        values = []
-        for idx in price_col_indices:
-            cell = row[idx - 1]
-            try:
-                val = round(float(str(cell.value).strip()), 4)
-                if val == 0:
-                    continue  # Skip zero values for highlighting
-                values.append((val, cell))
-            except:
-                continue
+# Classes of classify_price_matrix codes; 0 means the cell gets no fill
+PRICE_HIGHLIGHT_CLASSES = (None, "lowest", "highest", "tie", "medium")
 
-        if not values:
-            continue
+def _price_cell_value(value):
+    # Same parsing as the old cell-by-cell highlighting: float(str(value)) rounded to
+    # 4 places. Non-numeric, blank and zero cells don't take part (NaN).
+    try:
+        val = round(float(str(value).strip()), 4)
+    except Exception:
+        return np.nan
+    return np.nan if val == 0 else val
 
-        vals_only = [val for val, _ in values]
-        unique_vals = sorted(set(vals_only))
+def price_matrix(columns, n_rows):
+    """
+    Float matrix (n_rows x len(columns)) of the candidate price values of each column,
+    NaN where a cell doesn't take part. Each distinct value of a column is parsed once.
+    """
+    matrix = np.full((n_rows, len(columns)), np.nan)
+    for j, values in enumerate(columns):
+        values = pd.Series(values)
+        if pd.api.types.is_bool_dtype(values):
+            continue  # str(True) is not a number
+        if not pd.api.types.is_numeric_dtype(values):
+            # Factorize the text itself, as only str(value) is parsed; this also keeps
+            # True and 1 apart in mixed columns
+            values = values.map(str)
+        codes, uniques = pd.factorize(values)
+        if len(uniques):
+            # Missing values get code -1, which picks the trailing NaN
+            parsed = np.array([_price_cell_value(value) for value in uniques] + [np.nan])
+            matrix[:, j] = parsed[codes]
+    return matrix
+
+def classify_price_matrix(matrix):
+    """
+    Row-wise price classification of a price_matrix. Returns an int8 matrix of indices
+    into PRICE_HIGHLIGHT_CLASSES: a row with a single value or only equal values is a
+    tie, otherwise its minimum is lowest, its maximum highest, other values that occur
+    more than once are medium and the rest tie.
+    """
+    valid = ~np.isnan(matrix)
+    low = np.where(valid, matrix, np.inf).min(axis=1, initial=np.inf)[:, None]
+    high = np.where(valid, matrix, -np.inf).max(axis=1, initial=-np.inf)[:, None]
+    spread = valid & (low != high)
+
+    lowest = spread & (matrix == low)
+    highest = spread & (matrix == high) & ~lowest
+
+    # Values occurring more than once in their row; compared in row blocks so the
+    # rows x columns x columns comparison stays small on wide sheets
+    duplicated = np.zeros(matrix.shape, dtype=bool)
+    n_cols = matrix.shape[1]
+    block = max(1, (1 << 20) // max(n_cols * n_cols, 1))
+    for start in range(0, matrix.shape[0], block):
+        rows = matrix[start:start + block]
+        duplicated[start:start + block] = (rows[:, :, None] == rows[:, None, :]).sum(axis=2) > 1
+
+    codes = np.zeros(matrix.shape, dtype=np.int8)
+    codes[valid] = 3
+    codes[spread & duplicated] = 4
+    codes[highest] = 2
+    codes[lowest] = 1
+    return codes
+
+def apply_price_fills(ws, codes, col_indices, first_row=2):
+    """Fills the classified cells of a worksheet; col_indices maps matrix columns to 0-based sheet columns."""
+    fills = price_highlight_fills()
+    code_rows = codes.tolist()
+    row_pos, col_pos = np.nonzero(codes)
+    # Only the classified cells are visited, not every price cell of the sheet
+    for r, c in zip(row_pos.tolist(), col_pos.tolist()):
+        ws.cell(row=first_row + r, column=col_indices[c] + 1).fill = fills[PRICE_HIGHLIGHT_CLASSES[code_rows[r][c]]]
+
+def highlight_price_cells(ws, extra_quote_price_keywords=None):
+    header = [str(cell.value).strip() for cell in ws[1]]
+    price_col_indices = find_highlight_columns(header, extra_quote_price_keywords)
+    rows = list(ws.iter_rows(min_row=2, max_row=ws.max_row, values_only=True))
+    columns = [[row[idx] if idx < len(row) else None for row in rows] for idx in price_col_indices]
+    codes = classify_price_matrix(price_matrix(columns, len(rows)))
+    apply_price_fills(ws, codes, price_col_indices)
+
+def highlight_price_frame(ws, df, extra_quote_price_keywords=None):
+    """highlight_price_cells for a sheet just written from df, classifying straight from the frame."""
+    header = [str(col).strip() for col in df.columns]
+    price_col_indices = find_highlight_columns(header, extra_quote_price_keywords)
+    columns = [df.iloc[:, idx] for idx in price_col_indices]
+    codes = classify_price_matrix(price_matrix(columns, len(df)))
+    apply_price_fills(ws, codes, price_col_indices)
+
+KNOWN_QUOTE_PRICE_KEYWORDS = ["pricing", "price", "cost", "costs", "quote", "quoted"]
+
+def write_comparison_workbook(output_path, matched_df, unmatched_df, quote_columns):
+    """
+    Builds the Matched Parts and Unmatched Parts sheets, bolds the original quote columns
+    and highlights prices on the in-memory workbook, then saves it exactly once.
+    """
+    original_cols = [str(c).strip() for c in quote_columns]
 
-        if len(values) == 1:
-            values[0][1].fill = yellow_fill
-        elif len(set(vals_only)) == 1:
-            for _, cell in values:
-                cell.fill = yellow_fill
-        else:
-            min_val = min(vals_only)
-            max_val = max(vals_only)
-            for val, cell in values:
-                if val == min_val:
-                    cell.fill = green_fill
-                elif val == max_val:
-                    cell.fill = red_fill
-                elif vals_only.count(val) > 1:
-                    cell.fill = blue_fill
-                else:
-                    cell.fill = yellow_fill
+    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        with profile_phase("write_output.to_excel"):
+            matched_df.to_excel(writer, index=False, sheet_name="Matched Parts")
+            unmatched_df.to_excel(writer, index=False, sheet_name="Unmatched Parts")
 
-    wb.save(file_path)
+        with profile_phase("write_output.styling"):
+            # --- Bolden all columns from the quote file ---
+            ws_matched = writer.sheets["Matched Parts"]
+            header = [str(cell.value).strip() for cell in ws_matched[1]]
+            bold_columns(ws_matched, header, original_cols)
+
+            ws_unmatched = writer.sheets["Unmatched Parts"]
+            header = [str(cell.value).strip() for cell in ws_unmatched[1]]
+            extra_bold_cols = []
+            if 'Spec Difference (Original Spec)' in header:
+                extra_bold_cols.append(header.index('Spec Difference (Original Spec)'))
+            bold_columns(ws_unmatched, header, original_cols, extra_bold_cols)
+
+            highlight_price_frame(ws_matched, matched_df, extra_quote_price_keywords=KNOWN_QUOTE_PRICE_KEYWORDS)
+            highlight_price_frame(ws_unmatched, unmatched_df, extra_quote_price_keywords=KNOWN_QUOTE_PRICE_KEYWORDS)
 
 def kv_score(kv1, kv2):
     if not kv1 or not kv2:
@@ -429,263 +1809,368 @@ def kv_score(kv1, kv2):
     return matches / total_keys
 
 
-def find_closest_spec_and_costs(quote_spec, specs_folder):
+def find_closest_spec_and_costs(quote_spec, specs_folder, catalog=None):
     best_match = None
     best_score = 0
-    best_row = None
     best_file = None
     best_sheet = None
     best_part_number = None
 
-    all_spec_files = [f for f in os.listdir(specs_folder) if f.endswith((".xls", ".xlsx", ".xlsb"))]
+    if catalog is None:
+        catalog = load_spec_catalog(specs_folder)
 
     norm_quote_spec = normalize_spec_string(quote_spec)
-    for spec_file in all_spec_files:
-        file_path = os.path.join(specs_folder, spec_file)
-        try:
-            xls = pd.ExcelFile(file_path)
-        except Exception:
-            continue
-
-        for sheet_name in xls.sheet_names:
-            try:
-                df = xls.parse(sheet_name)
-                df.columns = [str(c).strip() for c in df.columns]
-            except Exception:
-                continue
-
-            spec_cols = find_spec_columns(df.columns)
-            if not spec_cols:
-                continue
-            spec_col = spec_cols[0]
-
-            part_number_cols = [
-                col for col in df.columns
-                if any(
-                    kw in col.strip().lower()
-                    for kw in ["part number", "partnumber", "p/n", "part", "hppart#"]
-                )
-            ]
-            part_number_col = part_number_cols[0] if part_number_cols else None
-
-            quote_kv = extract_kv_pairs(norm_quote_spec)
-            for idx, spec_val in df[spec_col].dropna().items():
-                spec_str = normalize_spec_string(spec_val)
-                spec_kv = extract_kv_pairs(spec_str)
-
-                # Calculate confidence based on original strings for all matches
-                base_score = difflib.SequenceMatcher(None, quote_spec, str(spec_val)).ratio()
-                
-                # --- Check for exact normalized match ---
-                if spec_str == norm_quote_spec:
-                    # For exact normalized matches, use original string similarity as confidence
-                    score = base_score
-                else:
-                    # For fuzzy matches, combine original string similarity with key-value matching
-                    kv_matches = 0
-                    kv_total = max(len(quote_kv), 1)
-                    for k, v in quote_kv.items():
-                        if k in spec_kv:
-                            try:
-                                v1 = float(re.sub(r'[^\d\.]', '', v))
-                                v2 = float(re.sub(r'[^\d\.]', '', spec_kv[k]))
-                                if abs(v1 - v2) < 0.1:
-                                    kv_matches += 1
-                                    continue
-                            except:
-                                pass
-                            if v == spec_kv[k]:
-                                kv_matches += 1
-                    kv_sim = kv_score(quote_kv, spec_kv)
-                    # Combine base similarity of original strings with key-value pair matching
-                    score = min(base_score * 0.7 + kv_sim * 0.3, 1.0)
-                    if score < 0.5 and kv_sim > 0.5:
-                        score = 0.5 + kv_sim * 0.5
-
-                # Keep track of the best match found so far
-                if score > best_score:
-                    best_score = score
-                    best_match = str(spec_val)  # Store original format, not normalized
-                    best_row = df.loc[idx]
-                    best_file = spec_file
-                    best_sheet = sheet_name
-                    best_part_number = str(df.loc[idx][part_number_col]) if part_number_col else None
-
+    quote_kv = extract_kv_pairs(norm_quote_spec)
+    rows_scored = 0
+    kv_scored = 0
+    if catalog.spec_vectors is not None:
+        for sheet_idx, sheet in enumerate(catalog.sheets):
+            df = sheet.df
+            spec_col = sheet.spec_cols[0]
+            part_number_col = sheet.part_number_col
+            norm_specs = sheet.norm_specs[spec_col]
+            rows_scored += int(df[spec_col].notna().sum())
+
+            # Vector engine: the feature similarity is the confidence; empty specs can't match
+            scores = np.where(df[spec_col].notna().to_numpy(),
+                              catalog.spec_vectors[sheet_idx][spec_col].similarity(quote_spec), -1.0)
+            pos = int(np.argmax(scores)) if len(scores) else -1
+            if pos >= 0 and scores[pos] > best_score:
+                idx = norm_specs.index[pos]
+                best_score = float(scores[pos])
+                best_match = str(df.loc[idx][spec_col])
+                best_file = sheet.file_name
+                best_sheet = sheet.sheet_name
+                best_part_number = str(df.loc[idx][part_number_col]) if part_number_col else None
+        entries_scored = rows_scored
+    else:
+        # Each distinct spec text is scored once. Entries are in order of first appearance
+        # and only a strictly better score replaces the best, so the first file/sheet/row
+        # with the top score still wins.
+        entries = catalog.closest_spec_entries()
+        entries_scored = len(entries)
+        for spec_val, spec_str, occurrences in entries:
+            rows_scored += len(occurrences)
+            spec_kv = extract_kv_pairs(spec_str)
+
+            # Calculate confidence based on original strings for all matches
+            base_score = difflib.SequenceMatcher(None, quote_spec, spec_val).ratio()
+            
+            # --- Check for exact normalized match ---
+            if spec_str == norm_quote_spec:
+                # For exact normalized matches, use original string similarity as confidence
+                score = base_score
+            else:
+                # For fuzzy matches, combine original string similarity with key-value pair matching
+                kv_sim = kv_score(quote_kv, spec_kv)
+                kv_scored += 1
+                score = min(base_score * 0.7 + kv_sim * 0.3, 1.0)
+                if score < 0.5 and kv_sim > 0.5:
+                    score = 0.5 + kv_sim * 0.5
+
+            # Keep track of the best match found so far
+            if score > best_score:
+                sheet, idx = occurrences[0]
+                part_number_col = sheet.part_number_col
+                best_score = score
+                best_match = spec_val  # Store original format, not normalized
+                best_file = sheet.file_name
+                best_sheet = sheet.sheet_name
+                best_part_number = str(sheet.df.loc[idx][part_number_col]) if part_number_col else None
+
+    if _PROFILE is not None:
+        _PROFILE.count("closest.sequence_matcher_ratio" if catalog.spec_vectors is None else "closest.vector_rows_scored",
+                       entries_scored)
+        _PROFILE.count("closest.kv_score", kv_scored)
+        _PROFILE.observe("closest.spec_rows_scored", rows_scored)
     return best_match, best_file, best_sheet, best_part_number, best_score
 
 def extract_numbers(s):
     return [float(x) for x in re.findall(r"\d+(?:\.\d+)?", str(s))]
 
-def get_first_price_for_spec(spec, specs_folder):
-    all_spec_files = [f for f in os.listdir(specs_folder) if f.endswith((".xls", ".xlsx", ".xlsb"))]
+def get_first_price_for_spec(spec, specs_folder, catalog=None):
+    if catalog is None:
+        catalog = load_spec_catalog(specs_folder)
     norm_spec = normalize_spec_string(spec)
-    for spec_file in all_spec_files:
-        file_path = os.path.join(specs_folder, spec_file)
-        try:
-            xls = pd.ExcelFile(file_path)
-        except Exception:
-            continue
-        for sheet_name in xls.sheet_names:
-            try:
-                df = xls.parse(sheet_name)
-                df.columns = [str(c).strip() for c in df.columns]
-            except Exception:
-                continue
-            # Accept all forms of 'Spec' columns
-            spec_col_patterns = [
-                r"^spec$", r"^specs$", r"^specification$", r"^specifications$"
-            ]
-            spec_cols = find_spec_columns(df.columns)
-            if not spec_cols:
-                continue
-            spec_col = spec_cols[0]
-            norm_specs = df[spec_col].astype(str).apply(normalize_spec_string)
-            matches = df[norm_specs == norm_spec]
-            if not matches.empty:
-                # Prioritize columns with 'orderable' in their name for price/cost/pricing
-                orderable_cols = [col for col in matches.columns if 'orderable' in col.lower() and (('price' in col.lower()) or ('cost' in col.lower()) or ('pricing' in col.lower()))]
-                for col in orderable_cols:
-                    try:
-                        price = float(matches.iloc[0][col])
-                        # Use None for volume if not a quantity column
-                        return None, price
-                    except:
-                        continue
-                # If no orderable price/cost/pricing found, try all price/cost/pricing columns
-                price_cols = find_price_columns(matches.columns)
-                for col in price_cols:
-                    try:
-                        price = float(matches.iloc[0][col])
-                        return None, price
-                    except:
-                        continue
-                # If no price/cost/pricing found, try all quantity columns for a valid price
-                qty_cols = [col for col in matches.columns if is_quantity_column(col)]
-                for col in qty_cols:
+    for sheet in catalog.sheets:
+        df = sheet.df
+        norm_specs = sheet.norm_specs[sheet.spec_cols[0]]
+        matches = df[norm_specs == norm_spec]
+        if not matches.empty:
+            # Prioritize columns with 'orderable' in their name for price/cost/pricing
+            orderable_cols = [col for col in matches.columns if 'orderable' in col.lower() and (('price' in col.lower()) or ('cost' in col.lower()) or ('pricing' in col.lower()))]
+            for col in orderable_cols:
+                try:
+                    price = float(matches.iloc[0][col])
+                    # Use None for volume if not a quantity column
+                    return None, price
+                except:
+                    continue
+            # If no orderable price/cost/pricing found, try all price/cost/pricing columns
+            price_cols = find_price_columns(matches.columns)
+            for col in price_cols:
+                try:
+                    price = float(matches.iloc[0][col])
+                    return None, price
+                except:
+                    continue
+            # If no price/cost/pricing found, try all quantity columns for a valid price
+            qty_cols = [col for col in matches.columns if is_quantity_column(col)]
+            for col in qty_cols:
+                try:
+                    price = float(matches.iloc[0][col])
+                    volume = extract_quantity_number(col)
+                    return volume, price
+                except:
+                    continue
+            # If no price found, fall back to closest quantity column
+            qty_numbers = [(col, extract_quantity_number(col)) for col in qty_cols]
+            qty_numbers = [(col, num) for col, num in qty_numbers if num is not None]
+            if qty_numbers:
+                # Try all columns sorted by volume (ascending)
+                for col, vol in sorted(qty_numbers, key=lambda x: x[1]):
                     try:
                         price = float(matches.iloc[0][col])
-                        volume = extract_quantity_number(col)
-                        return volume, price
+                        return vol, price
                     except:
                         continue
-                # If no price found, fall back to closest quantity column
-                qty_numbers = [(col, extract_quantity_number(col)) for col in qty_cols]
-                qty_numbers = [(col, num) for col, num in qty_numbers if num is not None]
-                if qty_numbers:
-                    # Try all columns sorted by volume (ascending)
-                    for col, vol in sorted(qty_numbers, key=lambda x: x[1]):
-                        try:
-                            price = float(matches.iloc[0][col])
-                            return vol, price
-                        except:
-                            continue
     return None, None
 
-def get_closest_price_for_spec(spec, quote_volume, specs_folder):
+def get_closest_price_for_spec(spec, quote_volume, specs_folder, catalog=None):
     """
     Returns (closest_qty_col, price) for the closest quantity column to quote_volume for the given spec.
     If a 'price' or 'cost' column exists, returns its value for the matching spec row.
     """
-    all_spec_files = [f for f in os.listdir(specs_folder) if f.endswith((".xls", ".xlsx", ".xlsb"))]
+    if catalog is None:
+        catalog = load_spec_catalog(specs_folder)
     norm_spec = normalize_spec_string(spec)
-    for spec_file in all_spec_files:
-        file_path = os.path.join(specs_folder, spec_file)
-        try:
-            xls = pd.ExcelFile(file_path)
-        except Exception:
-            continue
-        for sheet_name in xls.sheet_names:
-            try:
-                df = xls.parse(sheet_name)
-                df.columns = [str(c).strip() for c in df.columns]
-            except Exception:
-                continue
-            # Accept all forms of 'Spec' columns
-            spec_col_patterns = [
-                r"^spec$", r"^specs$", r"^specification$", r"^specifications$"
-            ]
-            spec_cols = find_spec_columns(df.columns)
-            if not spec_cols:
-                continue
-            spec_col = spec_cols[0]
-            norm_specs = df[spec_col].astype(str).apply(normalize_spec_string)
-            matches = df[norm_specs == norm_spec]
-            if not matches.empty:
-                # Accept any column containing "price" or "cost" (case-insensitive)
-                price_col_candidates = find_price_columns(matches.columns)
-                # If columns have date info, pick the most recent
-                # Use top-level extract_date_from_col
-
-                dated_cols = [(col, extract_date_from_col(col)) for col in price_col_candidates]
-                dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
-                if dated_cols:
-                    # Pick the most recent date
-                    most_recent_col = max(dated_cols, key=lambda x: x[1])[0]
-                    try:
-                        price = float(matches.iloc[0][most_recent_col])
-                        return most_recent_col, price
-                    except:
-                        pass
-                elif price_col_candidates:
-                    # Fallback: just use the first price/cost column
-                    price_col = price_col_candidates[0]
-                    try:
-                        price = float(matches.iloc[0][price_col])
-                        return price_col, price
-                    except:
-                        pass
-                # Fallback: original logic for quantity columns
-                qty_cols = [col for col in matches.columns if is_quantity_column(col)]
-                if not qty_cols:
-                    continue
-                qty_numbers = [(col, extract_quantity_number(col)) for col in qty_cols]
-                qty_numbers = [(col, num) for col, num in qty_numbers if num is not None]
-                if not qty_numbers:
-                    continue
-                if quote_volume is not None:
-                    closest_col, _ = min(qty_numbers, key=lambda x: abs(x[1] - quote_volume))
-                else:
-                    closest_col = qty_numbers[0][0]
+    for sheet in catalog.sheets:
+        df = sheet.df
+        norm_specs = sheet.norm_specs[sheet.spec_cols[0]]
+        matches = df[norm_specs == norm_spec]
+        if not matches.empty:
+            # Accept any column containing "price" or "cost" (case-insensitive)
+            price_col_candidates = find_price_columns(matches.columns)
+            # If columns have date info, pick the most recent
+            # Use top-level extract_date_from_col
+
+            dated_cols = [(col, extract_date_from_col(col)) for col in price_col_candidates]
+            dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
+            if dated_cols:
+                # Pick the most recent date
+                most_recent_col = max(dated_cols, key=lambda x: x[1])[0]
                 try:
-                    price = float(matches.iloc[0][closest_col])
-                    return closest_col, price
+                    price = float(matches.iloc[0][most_recent_col])
+                    return most_recent_col, price
                 except:
-                    continue
+                    pass
+            elif price_col_candidates:
+                # Fallback: just use the first price/cost column
+                price_col = price_col_candidates[0]
+                try:
+                    price = float(matches.iloc[0][price_col])
+                    return price_col, price
+                except:
+                    pass
+            # Fallback: original logic for quantity columns
+            qty_cols = [col for col in matches.columns if is_quantity_column(col)]
+            if not qty_cols:
+                continue
+            qty_numbers = [(col, extract_quantity_number(col)) for col in qty_cols]
+            qty_numbers = [(col, num) for col, num in qty_numbers if num is not None]
+            if not qty_numbers:
+                continue
+            if quote_volume is not None:
+                closest_col, _ = min(qty_numbers, key=lambda x: abs(x[1] - quote_volume))
+            else:
+                closest_col = qty_numbers[0][0]
+            try:
+                price = float(matches.iloc[0][closest_col])
+                return closest_col, price
+            except:
+                continue
     return None, None
 
-# -------- GUI Implementation --------
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+def resolve_unmatched_rows(rows, catalog, executor=None, workers=1, progress_label=None, cancel_event=None, match_cache=None):
+    """
+    Finds the closest catalog spec and its price for each (quote spec, quote volume) row
+    without an exact match. Returns one (best_match, best_file, best_sheet, best_part_number,
+    confidence_score, closest_vol_col, existing_price, moq_vol_value) tuple per row.
+    The closest-spec search runs once per distinct quote spec; the volume-dependent price
+    and MOQ lookup once per distinct (spec, volume) pair.
+    """
+    unique_specs = list(dict.fromkeys(quote_spec for quote_spec, _ in rows))
+    unique_rows = list(dict.fromkeys(rows))
+    if _PROFILE is not None:
+        _PROFILE.count("closest.unique_quote_specs", len(unique_specs))
+    report_progress(progress_label, f"Finding closest specs for {len(unique_specs)} distinct specs "
+                                    f"of {len(rows)} unmatched parts...")
+    closest_by_spec = cached_search(match_cache, "closest", _closest_specs_chunk, unique_specs, catalog, executor, workers,
+                                    row_progress(progress_label, cancel_event, "Finding closest specs", len(unique_specs)))
+    resolved = map_row_chunks(
+        _closest_prices_chunk, [(closest_by_spec[quote_spec], quote_volume) for quote_spec, quote_volume in unique_rows],
+        catalog, executor, workers, row_progress(progress_label, cancel_event, "Looking up closest prices", len(unique_rows)))
+    resolved_by_row = dict(zip(unique_rows, resolved))
+    return [resolved_by_row[row] for row in rows]
+
+def resolve_closest_price(closest, quote_volume, catalog):
+    """Volume-dependent part of resolve_unmatched_rows, for a find_closest_spec_and_costs result."""
+    best_match, best_file, best_sheet, best_part_number, confidence_score = closest
+
+    # Get closest price and volume column
+    closest_vol_col, existing_price = get_closest_price_for_spec(best_match, quote_volume, catalog.specs_folder, catalog=catalog)
+
+    # --- Find the MOQ/Volume value for the closest spec ---
+    moq_vol_value = None
+    sheet = catalog.get_sheet(best_file, best_sheet) if best_match and best_file and best_sheet else None
+    if sheet is not None:
+        try:
+            df = sheet.df
+            norm_specs = sheet.norm_specs[sheet.spec_cols[0]]
+            match_row = df[norm_specs == normalize_spec_string(best_match)]
+            if not match_row.empty:
+                # Look for a column with 'moq', 'volume', or 'qty' in the name first
+                moq_vol_cols = [col for col in df.columns if any(x in col.lower() for x in ["moq", "volume", "qty", "quantity"])]
+                for col in moq_vol_cols:
+                    val = match_row.iloc[0][col]
+                    if pd.notna(val):
+                        moq_vol_value = val
+                        break
+                # If no dedicated MOQ/Volume column found, use the closest volume column info
+                if moq_vol_value is None and closest_vol_col:
+                    # If closest_vol_col is a quantity column like "1K", "5K", extract the number
+                    extracted_qty = extract_quantity_number(closest_vol_col)
+                    if extracted_qty:
+                        moq_vol_value = f"{extracted_qty:,} pcs"  # Format like "1,000 pcs"
+                    else:
+                        moq_vol_value = closest_vol_col  # Use as-is if not a quantity
+        except Exception:
+            pass
 
-def run_comparator(quote_path, specs_folder, output_path, progress_label=None):
-    if not os.path.isfile(quote_path) or not os.path.isdir(specs_folder):
-        if progress_label:
-            progress_label.config(text="❌ Invalid quote file or specs folder path.")
-        else:
-            print("❌ Invalid quote file or specs folder path.")
+    return (best_match, best_file, best_sheet, best_part_number, confidence_score,
+            closest_vol_col, existing_price, moq_vol_value)
+
+# -------- Comparison run --------
+def report_progress(progress_label, text):
+    # progress_label is a Tk label, a callable taking the message (CLI) or None
+    if progress_label is None:
         return
-    if progress_label:
-        progress_label.config(text="Reading quote file...")
-        progress_label.update_idletasks()
-    quote_df = pd.read_excel(quote_path)
-    result_df, added_cols = match_specs_and_append_prices(quote_df, specs_folder)
-    if progress_label:
-        progress_label.config(text="Saving matched parts...")
-        progress_label.update_idletasks()
-    result_df.to_excel(output_path, index=False)
+    if callable(progress_label):
+        progress_label(text)
+        return
+    progress_label.config(text=text)
+    progress_label.update_idletasks()
 
-    # --- Create a new sheet for unmatched parts ---
+def report_result(progress_label, text):
+    # Final status of a run; printed when there is nowhere else to show it
+    if progress_label is None:
+        print(text)
+    else:
+        report_progress(progress_label, text)
+
+
+class ComparisonCancelled(Exception):
+    """Raised inside a comparison run once its cancel_event is set."""
+
+
+def check_cancelled(cancel_event):
+    # cancel_event is a threading.Event set from the GUI thread, or None
+    if cancel_event is not None and cancel_event.is_set():
+        raise ComparisonCancelled("Comparison cancelled.")
+
+# Minimum seconds between two row progress messages, so the CLI doesn't print one per chunk
+ROW_PROGRESS_INTERVAL = 1.0
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+def row_progress(progress_label, cancel_event, text, total_rows):
+    """
+    on_chunk_done callback for map_row_chunks: reports "<text> done/total" with an ETA
+    extrapolated from the rows done so far, and stops the run once it is cancelled.
+    """
+    start = time.perf_counter()
+    last_report = [start]
+
+    def on_chunk_done(rows_done):
+        check_cancelled(cancel_event)
+        now = time.perf_counter()
+        if progress_label is None or (rows_done < total_rows and now - last_report[0] < ROW_PROGRESS_INTERVAL):
+            return
+        last_report[0] = now
+        message = f"{text} {rows_done}/{total_rows}"
+        if rows_done < total_rows:
+            eta = (now - start) / rows_done * (total_rows - rows_done)
+            message += f", about {format_duration(eta)} left"
+        report_progress(progress_label, message + "...")
+    return on_chunk_done
+
+
+def get_diff_words(a, b):
+    a_words = str(a).split()
+    b_words = str(b).split()
+    a_words_lower = [w.lower() for w in a_words]
+    b_words_lower = [w.lower() for w in b_words]
+    matcher = difflib.SequenceMatcher(None, a_words_lower, b_words_lower)
+    diff_a = []
+    diff_b = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        # Only include words that are truly different (ignoring case)
+        if tag == 'replace' or tag == 'insert':
+            for idx in range(j1, j2):
+                if b_words_lower[idx] not in a_words_lower[i1:i2]:
+                    diff_b.append(b_words[idx])
+        if tag == 'replace' or tag == 'delete':
+            for idx in range(i1, i2):
+                if a_words_lower[idx] not in b_words_lower[j1:j2]:
+                    diff_a.append(a_words[idx])
+    return ' '.join(diff_b), ' '.join(diff_a)
+
+
+def compare_quote_frame(quote_df, catalog, executor=None, workers=1, progress_label=None, cancel_event=None, match_cache=None, matches=None, priced=None):
+    """
+    Matches a quote frame against the catalog and splits it into matched and unmatched parts.
+    Returns (matched_df, unmatched_df, matches, has_closest_volumes):
+    - matched_df holds the matched quote rows only; widen_matches(matched_df, matches,
+      catalog, matched_quote_rows(matches)) adds the per-sheet price columns for output.
+    - matches is the long match table of the whole frame.
+    - unmatched_df carries both "Closest Spec MOQ/Volume" and "Closest Volume";
+      finalize_unmatched_columns keeps the one that applies once all rows are known.
+    Raises ComparisonCancelled between row chunks once cancel_event is set.
+    When quote_df is one chunk of a quote, pass the chunk's matches from an earlier
+    match_quote_frame pass and priced, the priced_sheets of the whole quote, so rows are
+    split the same way as without chunks.
+    """
+    if matches is None:
+        if _PROFILE is not None:
+            _PROFILE.count("quote_rows", len(quote_df))
+        with profile_phase("match"):
+            matches = match_quote_frame(quote_df, catalog, executor, workers, progress_label, cancel_event, match_cache)
 
     # --- Create a new sheet for unmatched parts ---
-    if added_cols:
-        unmatched_mask = result_df[added_cols].isna().all(axis=1)
-        unmatched_df = result_df[unmatched_mask]
-        matched_df = result_df[~unmatched_mask]
+    quote_view = move_columns_to_end(quote_df, ["Remark"] + quote_spec_columns(quote_df.columns))
+    matched_rows = matched_quote_rows(matches, priced)
+    unmatched_mask = np.ones(len(quote_df), dtype=bool)
+    unmatched_mask[matched_rows] = False
+    matched_df = quote_view.iloc[matched_rows]
+    unmatched_df = quote_view.iloc[np.flatnonzero(unmatched_mask)]
+
+    # Dynamically find the spec column name (case-insensitive, matches "spec" or "specs")
+    spec_col_candidates = find_spec_columns(unmatched_df.columns)
+    if spec_col_candidates:
+        spec_col = spec_col_candidates[0]
     else:
-        unmatched_df = result_df.copy()
-        matched_df = result_df.iloc[0:0]
+        raise KeyError("No spec column found in unmatched_df. Expected one of: 'Spec', 'Specs', 'SPEC', 'SPECs'")
 
     # --- For each unmatched part, find closest spec ---
+    unmatched_rows = list(zip(unmatched_df[spec_col].tolist(), find_quote_volumes(unmatched_df)))
+    if _PROFILE is not None:
+        _PROFILE.count("unmatched_rows", len(unmatched_rows))
+    with profile_phase("closest_spec"):
+        resolved_rows = resolve_unmatched_rows(unmatched_rows, catalog, executor, workers, progress_label, cancel_event,
+                                               match_cache)
+
     closest_specs = []
     closest_part_numbers = []
     spec_files = []
@@ -693,215 +2178,656 @@ def run_comparator(quote_path, specs_folder, output_path, progress_label=None):
     closest_volumes = []
     existing_prices = []
     closest_spec_moq_vols = []
-    cost_deltas = []  # New: store cost delta values
     confidence_scores = []  # New: store confidence scores
 
-    # Dynamically find the spec column name (case-insensitive, matches "spec" or "specs")
-    spec_col_candidates = find_spec_columns(unmatched_df.columns)
-    if spec_col_candidates:
-        spec_col = spec_col_candidates[0]
-    else:
-        raise KeyError("No spec column found in unmatched_df. Expected one of: 'Spec', 'Specs', 'SPEC', 'SPECs'")
-
-    # Find most recent price column in quote file
-    # Use top-level extract_date_from_col
-    def norm_col_name(col):
-        return re.sub(r'[^a-zA-Z0-9]', '', str(col)).lower()
-    price_cols = [col for col in unmatched_df.columns if any(x in norm_col_name(col) for x in ["price", "cost", "pricing"])]
-    dated_cols = [(col, extract_date_from_col(col)) for col in price_cols]
-    dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
-    if dated_cols:
-        most_recent_quote_price_col = max(dated_cols, key=lambda x: x[1])[0]
-    elif price_cols:
-        most_recent_quote_price_col = price_cols[0]
-    else:
-        most_recent_quote_price_col = None
-
-    for _, row in unmatched_df.iterrows():
-        quote_spec_original = row[spec_col]  # Keep original format
-        best_match, best_file, best_sheet, best_part_number, confidence_score = find_closest_spec_and_costs(quote_spec_original, specs_folder)
+    for resolved in resolved_rows:
+        (best_match, best_file, best_sheet, best_part_number, confidence_score,
+         closest_vol_col, existing_price, moq_vol_value) = resolved
         closest_specs.append(best_match)
         closest_part_numbers.append(best_part_number)
         spec_files.append(best_file)
         spec_sheets.append(best_sheet)
         confidence_scores.append(f"{round(confidence_score * 100, 1)}%" if confidence_score is not None else None)  # Convert to percentage with % sign
 
-        # Find quote part's volume (try to get the first numeric value from any column with 'volume' in its name)
-        quote_volume = None
-        for col in unmatched_df.columns:
-            if "volume" in col.lower() and pd.notna(row[col]):
-                quote_volume = extract_quantity_number(row[col])
-                if quote_volume is not None:
-                    break
-
-        # Get closest price and volume column
-        closest_vol_col, existing_price = get_closest_price_for_spec(best_match, quote_volume, specs_folder)
-
         # If the column is a price/cost column, don't treat it as a volume column
         if closest_vol_col and ("price" in closest_vol_col.lower() or "cost" in closest_vol_col.lower()):
             closest_volumes.append("")  # or None
         else:
             closest_volumes.append(closest_vol_col)
 
-        # --- Find the MOQ/Volume value for the closest spec ---
-        moq_vol_value = None
-        if best_match and best_file and best_sheet:
-            file_path = os.path.join(specs_folder, best_file)
-            try:
-                xls = pd.ExcelFile(file_path)
-                df = xls.parse(best_sheet)
-                df.columns = [str(c).strip() for c in df.columns]
-                spec_cols = find_spec_columns(df.columns)
-                if spec_cols:
-                    spec_col_in_file = spec_cols[0]
-                    norm_specs = df[spec_col_in_file].astype(str).apply(normalize_spec_string)
-                    match_row = df[norm_specs == normalize_spec_string(best_match)]
-                    if not match_row.empty:
-                        # Look for a column with 'moq', 'volume', or 'qty' in the name first
-                        moq_vol_cols = [col for col in df.columns if any(x in col.lower() for x in ["moq", "volume", "qty", "quantity"])]
-                        for col in moq_vol_cols:
-                            val = match_row.iloc[0][col]
-                            if pd.notna(val):
-                                moq_vol_value = val
-                                break
-                        # If no dedicated MOQ/Volume column found, use the closest volume column info
-                        if moq_vol_value is None and closest_vol_col:
-                            # If closest_vol_col is a quantity column like "1K", "5K", extract the number
-                            extracted_qty = extract_quantity_number(closest_vol_col)
-                            if extracted_qty:
-                                moq_vol_value = f"{extracted_qty:,} pcs"  # Format like "1,000 pcs"
-                            else:
-                                moq_vol_value = closest_vol_col  # Use as-is if not a quantity
-            except Exception:
-                pass
         closest_spec_moq_vols.append(moq_vol_value)
-
         existing_prices.append(existing_price)
 
-        # Calculate cost delta between most recent quote price and existing price
-        quote_price = None
-        if most_recent_quote_price_col:
-            try:
-                quote_price = float(row[most_recent_quote_price_col])
-            except:
-                quote_price = None
-        existing_price = existing_prices[-1] if existing_prices else None
-        if existing_price is not None and quote_price is not None:
-            cost_delta = round(quote_price - existing_price, 4)
-        else:
-            cost_delta = None
-        cost_deltas.append(cost_delta)
+    # Cost delta between most recent quote price and existing price
+    unmatched_cost_deltas = cost_deltas(quote_price_array(unmatched_df), existing_prices)
 
     # Insert Closest Part Number before Closest Spec
     insert_idx = list(unmatched_df.columns).index("Closest Spec") if "Closest Spec" in unmatched_df.columns else len(unmatched_df.columns)
     unmatched_df.insert(insert_idx, "Closest Part Number", closest_part_numbers)
     unmatched_df.loc[:, "Closest Spec"] = closest_specs
     unmatched_df.loc[:, "Confidence Score (%)"] = confidence_scores  # New column for confidence scores
-    
-    # Only add "Closest Spec MOQ/Volume" if there's no "Closest Volume" column with values
-    if not any(closest_volumes):
-        unmatched_df.loc[:, "Closest Spec MOQ/Volume"] = closest_spec_moq_vols  # New column for MOQ/Volume
-    
+    unmatched_df.loc[:, "Closest Spec MOQ/Volume"] = closest_spec_moq_vols  # New column for MOQ/Volume
     unmatched_df.loc[:, "Existing Price"] = existing_prices
     # Insert Cost Delta column right after Existing Price
     if "Existing Price" in unmatched_df.columns:
         cost_delta_idx = list(unmatched_df.columns).index("Existing Price") + 1
-        unmatched_df.insert(cost_delta_idx, "Cost Delta", cost_deltas)
+        unmatched_df.insert(cost_delta_idx, "Cost Delta", unmatched_cost_deltas)
     else:
-        unmatched_df["Cost Delta"] = cost_deltas
-    # Only add "Closest Volume" if there is at least one non-empty value
-    if any(closest_volumes):
-        unmatched_df.loc[:, "Closest Volume"] = closest_volumes
-    elif "Closest Volume" in unmatched_df.columns:
-        unmatched_df = unmatched_df.drop(columns=["Closest Volume"])
+        unmatched_df["Cost Delta"] = unmatched_cost_deltas
+    unmatched_df.loc[:, "Closest Volume"] = closest_volumes
     unmatched_df.loc[:, "Spec Source File"] = spec_files
     unmatched_df.loc[:, "Spec Source Sheet"] = spec_sheets
 
-    # Remove matched parts' sheet columns from unmatched_df
-    if added_cols:
-        unmatched_df = unmatched_df.drop(columns=added_cols, errors="ignore")
-
-    # --- Save only matched parts to the first sheet ---
-    matched_df.to_excel(output_path, index=False, sheet_name="Matched Parts")
-
-    # --- Bolden all columns from the quote file in the 'Matched Parts' sheet (after writing matched_df) ---
-    wb = load_workbook(output_path)
-    if 'Matched Parts' in wb.sheetnames:
-        ws_matched = wb['Matched Parts']
-        header = [str(cell.value).strip() for cell in ws_matched[1]]
-        original_quote_df = pd.read_excel(quote_path)
-        original_cols = [c.strip() for c in original_quote_df.columns]
-        bold_columns(ws_matched, header, original_cols)
-        wb.save(output_path)
-
-    def get_diff_words(a, b):
-        a_words = str(a).split()
-        b_words = str(b).split()
-        a_words_lower = [w.lower() for w in a_words]
-        b_words_lower = [w.lower() for w in b_words]
-        matcher = difflib.SequenceMatcher(None, a_words_lower, b_words_lower)
-        diff_a = []
-        diff_b = []
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            # Only include words that are truly different (ignoring case)
-            if tag == 'replace' or tag == 'insert':
-                for idx in range(j1, j2):
-                    if b_words_lower[idx] not in a_words_lower[i1:i2]:
-                        diff_b.append(b_words[idx])
-            if tag == 'replace' or tag == 'delete':
-                for idx in range(i1, i2):
-                    if a_words_lower[idx] not in b_words_lower[j1:j2]:
-                        diff_a.append(a_words[idx])
-        return ' '.join(diff_b), ' '.join(diff_a)
-
     # Add these columns BEFORE writing unmatched_df to Excel
     diff_closest = []
     diff_original = []
-    for _, row in unmatched_df.iterrows():
-        if pd.notna(row["Closest Spec"]) and pd.notna(row[spec_col]):
-            d_closest, d_original = get_diff_words(row[spec_col], row["Closest Spec"])
-            diff_closest.append(d_closest)
-            diff_original.append(d_original)
-        else:
-            diff_closest.append("")
-            diff_original.append("")
+    with profile_phase("spec_difference"):
+        for _, row in unmatched_df.iterrows():
+            if pd.notna(row["Closest Spec"]) and pd.notna(row[spec_col]):
+                d_closest, d_original = get_diff_words(row[spec_col], row["Closest Spec"])
+                diff_closest.append(d_closest)
+                diff_original.append(d_original)
+            else:
+                diff_closest.append("")
+                diff_original.append("")
 
     unmatched_df["Spec Difference (Original Spec)"] = diff_original
     unmatched_df["Spec Difference (Closest Spec)"] = diff_closest
 
-    # --- Create a new sheet for unmatched parts ---
-    with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        unmatched_df.to_excel(writer, sheet_name="Unmatched Parts", index=False)
-
-    # --- Bolden all columns from the quote file in the 'Unmatched Parts' sheet (after writing unmatched_df) ---
-    wb = load_workbook(output_path)
-    if 'Unmatched Parts' in wb.sheetnames:
-        ws_unmatched = wb['Unmatched Parts']
-        header = [str(cell.value).strip() for cell in ws_unmatched[1]]
-        original_quote_df = pd.read_excel(quote_path)
-        original_cols = [c.strip() for c in original_quote_df.columns]
-        extra_bold_cols = []
-        if 'Spec Difference (Original Spec)' in header:
-            extra_bold_cols.append(header.index('Spec Difference (Original Spec)'))
-        bold_columns(ws_unmatched, header, original_cols, extra_bold_cols)
-        wb.save(output_path)
-
-    known_quote_price_keywords = ["pricing", "price", "cost", "costs", "quote", "quoted"]
-
-    highlight_prices(output_path, sheet_name="Matched Parts", extra_quote_price_keywords=known_quote_price_keywords)
-    highlight_prices(output_path, sheet_name="Unmatched Parts", extra_quote_price_keywords=known_quote_price_keywords)
-
-    if progress_label:
-        progress_label.config(text=f"\n✅ Done! Prices highlighted and saved to: {output_path}")
-        
-    else:
-        print(f"\n✅ Done! Prices highlighted and saved to: {output_path}")
+    return matched_df, unmatched_df, matches, any(closest_volumes)
+
+
+OUTPUT_FORMATS = ("xlsx", "csv")
+
+def csv_output_paths(output_path):
+    # CSV output has no sheets, so each sheet goes to its own file next to output_path
+    base = os.path.splitext(output_path)[0]
+    return {"Matched Parts": f"{base}_matched.csv", "Unmatched Parts": f"{base}_unmatched.csv"}
+
+def write_comparison_csv(output_path, matched_df, unmatched_df):
+    paths = csv_output_paths(output_path)
+    # utf-8-sig so Excel recognises the encoding when the file is opened directly
+    matched_df.to_csv(paths["Matched Parts"], index=False, encoding="utf-8-sig")
+    unmatched_df.to_csv(paths["Unmatched Parts"], index=False, encoding="utf-8-sig")
+
+def output_saved_message(output_path, output_format):
+    if output_format == "csv":
+        paths = csv_output_paths(output_path)
+        return f"\n✅ Done! Results saved to: {paths['Matched Parts']} and {paths['Unmatched Parts']}"
+    return f"\n✅ Done! Prices highlighted and saved to: {output_path}"
+
+
+def finalize_unmatched_columns(unmatched_df, has_closest_volumes):
+    # Only keep "Closest Volume" if there is at least one non-empty value,
+    # otherwise show the closest spec's MOQ/Volume instead
+    if has_closest_volumes:
+        return unmatched_df.drop(columns=["Closest Spec MOQ/Volume"])
+    return unmatched_df.drop(columns=["Closest Volume"])
+
+
+def run_comparator(quote_path, specs_folder, output_path, progress_label=None, workers=1, cache_dir=None, chunk_size=None, profile=False, output_format="xlsx", match_export=None, cancel_event=None, match_engine="difflib"):
+    """
+    Compares a quote against a specs folder and writes the Matched/Unmatched Parts output.
+    Returns True once the output is written, False if the input paths are invalid.
+    match_export ("csv" or "parquet") also writes the long match table to <output>_matches.<format>.
+    Setting cancel_event (a threading.Event) stops the run with ComparisonCancelled at the
+    next spec file or row chunk; the output is only written by runs that get that far.
+    match_engine "vector" scores fuzzy and closest-spec candidates by spec feature vectors
+    (see SpecVectors) instead of difflib.
+    """
+    if profile:
+        # Same run with the profiler hooks enabled, then the report next to the output
+        with profiling_session() as run_profile:
+            done = run_comparator(quote_path, specs_folder, output_path, progress_label, workers=workers,
+                                  cache_dir=cache_dir, chunk_size=chunk_size, output_format=output_format,
+                                  match_export=match_export, cancel_event=cancel_event, match_engine=match_engine)
+        if done:
+            write_profile_report(run_profile, profile_report_path(output_path), quote=quote_path,
+                                 specs_folder=specs_folder, output=output_path, workers=workers,
+                                 cached_catalog=bool(cache_dir), chunk_size=chunk_size, output_format=output_format,
+                                 match_engine=match_engine)
+        return done
+    if chunk_size:
+        return run_comparator_streaming(quote_path, specs_folder, output_path, progress_label, workers=workers,
+                                        cache_dir=cache_dir, chunk_size=chunk_size, output_format=output_format,
+                                        match_export=match_export, cancel_event=cancel_event, match_engine=match_engine)
+    if not os.path.isfile(quote_path) or not os.path.isdir(specs_folder):
+        report_result(progress_label, "❌ Invalid quote file or specs folder path.")
+        return False
+    report_progress(progress_label, "Reading quote file...")
+    with profile_phase("read_quote"):
+        quote_df = pd.read_excel(quote_path)
+    check_cancelled(cancel_event)
+    # Taken before loading, so a spec file saved during the run can't be cached as unchanged
+    fingerprint = catalog_fingerprint(specs_folder, match_engine) if cache_dir else None
+    report_progress(progress_label, "Loading spec files...")
+    with profile_phase("load_catalog"):
+        catalog = load_spec_catalog(specs_folder, cache_dir=cache_dir, progress_label=progress_label,
+                                    cancel_event=cancel_event, workers=workers)
+    if match_engine == "vector":
+        with profile_phase("load_catalog.spec_vectors"):
+            catalog.enable_vector_engine()
+    report_progress(progress_label, f"Matching quote rows against {len(catalog.sheets)} spec sheets...")
+    with match_executor(catalog, workers) as executor, open_match_cache(cache_dir, catalog, fingerprint) as match_cache:
+        write_quote_comparison(quote_df, catalog, output_path, executor, workers, progress_label, cancel_event,
+                               match_cache, output_format, match_export)
+
+    report_result(progress_label, output_saved_message(output_path, output_format))
+    return True
+
+
+def write_quote_comparison(quote_df, catalog, output_path, executor=None, workers=1, progress_label=None, cancel_event=None, match_cache=None, output_format="xlsx", match_export=None):
+    """
+    Matches a quote frame against an already loaded catalog and writes its output.
+    Returns (matched rows, unmatched rows).
+    """
+    matched_df, unmatched_df, matches, has_closest_volumes = compare_quote_frame(
+        quote_df, catalog, executor, workers, progress_label, cancel_event, match_cache)
+    check_cancelled(cancel_event)
+    unmatched_df = finalize_unmatched_columns(unmatched_df, has_closest_volumes)
+
+    # --- Write both sheets, bold quote columns and highlight prices, saving the workbook once ---
+    report_progress(progress_label, "Saving results...")
+    with profile_phase("write_output"):
+        matched_df, _ = widen_matches(matched_df, matches, catalog, matched_quote_rows(matches))
+        if output_format == "csv":
+            write_comparison_csv(output_path, matched_df, unmatched_df)
+        else:
+            write_comparison_workbook(output_path, matched_df, unmatched_df, quote_df.columns)
+        if match_export:
+            export_matches(matches, match_export_path(output_path, match_export), match_export)
+    return len(matched_df), len(unmatched_df)
+
+
+# -------- Batch mode --------
+# Several quotes of one sourcing event against the same specs folder: the catalog, the
+# worker pool and the match cache are set up once and shared by every quote.
+QUOTE_FILE_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+BATCH_SUMMARY_NAME = "Batch_Summary"
+
+def list_quote_files(quotes):
+    """Quote files of a folder (sorted) or of a list of files and folders, skipping Excel lock files."""
+    if isinstance(quotes, str):
+        quotes = [quotes]
+    quote_paths = []
+    for path in quotes:
+        if os.path.isdir(path):
+            quote_paths.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                               if f.lower().endswith(QUOTE_FILE_EXTENSIONS) and not f.startswith("~$"))
+        else:
+            quote_paths.append(path)
+    return quote_paths
+
+def batch_output_paths(quote_paths, output_folder, output_format="xlsx"):
+    # <quote name>_Spec_Comparison.<format>, numbered when two quotes share a name
+    paths = []
+    used = set()
+    for quote_path in quote_paths:
+        stem = os.path.splitext(os.path.basename(quote_path))[0] + "_Spec_Comparison"
+        name = stem
+        n = 2
+        while name.lower() in used:
+            name = f"{stem}_{n}"
+            n += 1
+        used.add(name.lower())
+        paths.append(os.path.join(output_folder, f"{name}.{output_format}"))
+    return paths
+
+def output_file_names(output_path, output_format):
+    if output_format == "csv":
+        return ", ".join(os.path.basename(p) for p in csv_output_paths(output_path).values())
+    return os.path.basename(output_path)
+
+def write_batch_summary(summary_df, output_folder, output_format="xlsx"):
+    summary_path = os.path.join(output_folder, f"{BATCH_SUMMARY_NAME}.{output_format}")
+    if output_format == "csv":
+        summary_df.to_csv(summary_path, index=False, encoding="utf-8-sig")
+        return summary_path
+    from openpyxl.styles import Font
+    with pd.ExcelWriter(summary_path, engine="openpyxl") as writer:
+        summary_df.to_excel(writer, index=False, sheet_name="Summary")
+        ws = writer.sheets["Summary"]
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+        for col_idx, col in enumerate(summary_df.columns, start=1):
+            width = max([len(str(col))] + [len(str(v)) for v in summary_df[col]])
+            ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = min(width + 2, 80)
+    return summary_path
+
+def run_batch_comparator(quotes, specs_folder, output_folder, progress_label=None, workers=1, cache_dir=None, profile=False, output_format="xlsx", match_export=None, cancel_event=None, match_engine="difflib"):
+    """
+    Compares several quotes (a folder of quote files or a list of files/folders) against one
+    specs folder, writing one comparison per quote into output_folder plus a Batch_Summary
+    with the matched/unmatched counts of each quote. The specs folder is loaded once and
+    spec searches are shared between quotes, so a spec quoted by several suppliers is only
+    searched once. A quote that fails is reported in the summary and the batch goes on.
+    Returns the summary DataFrame, or None if the input paths are invalid.
+    """
+    if profile:
+        with profiling_session() as run_profile:
+            summary_df = run_batch_comparator(quotes, specs_folder, output_folder, progress_label, workers=workers,
+                                              cache_dir=cache_dir, output_format=output_format,
+                                              match_export=match_export, cancel_event=cancel_event,
+                                              match_engine=match_engine)
+        if summary_df is not None:
+            write_profile_report(run_profile, os.path.join(output_folder, f"{BATCH_SUMMARY_NAME}_profile.json"),
+                                 quotes=list_quote_files(quotes), specs_folder=specs_folder, output=output_folder,
+                                 workers=workers, cached_catalog=bool(cache_dir), output_format=output_format,
+                                 match_engine=match_engine)
+        return summary_df
+    quote_paths = list_quote_files(quotes)
+    if not quote_paths or not all(os.path.isfile(p) for p in quote_paths) or not os.path.isdir(specs_folder):
+        report_result(progress_label, "❌ Invalid quote files or specs folder path.")
+        return None
+    os.makedirs(output_folder, exist_ok=True)
+    output_paths = batch_output_paths(quote_paths, output_folder, output_format)
+
+    fingerprint = catalog_fingerprint(specs_folder, match_engine) if cache_dir else None
+    report_progress(progress_label, "Loading spec files...")
+    start = time.perf_counter()
+    with profile_phase("load_catalog"):
+        catalog = load_spec_catalog(specs_folder, cache_dir=cache_dir, progress_label=progress_label,
+                                    cancel_event=cancel_event, workers=workers)
+    if match_engine == "vector":
+        with profile_phase("load_catalog.spec_vectors"):
+            catalog.enable_vector_engine()
+    load_seconds = time.perf_counter() - start
+
+    summary = []
+    with match_executor(catalog, workers) as executor, \
+            open_match_cache(cache_dir, catalog, fingerprint, in_memory=True) as match_cache:
+        for i, (quote_path, output_path) in enumerate(zip(quote_paths, output_paths), start=1):
+            check_cancelled(cancel_event)
+            quote_name = os.path.basename(quote_path)
+            report_progress(progress_label, f"Quote {i}/{len(quote_paths)}: {quote_name}...")
+            start = time.perf_counter()
+            row = {"Quote File": quote_name, "Quote Rows": None, "Matched Rows": None, "Unmatched Rows": None,
+                   "Matched (%)": None, "Output File": output_file_names(output_path, output_format), "Seconds": None,
+                   "Status": "OK"}
+            try:
+                with profile_phase("read_quote"):
+                    quote_df = pd.read_excel(quote_path)
+                matched_rows, unmatched_rows = write_quote_comparison(
+                    quote_df, catalog, output_path, executor, workers, progress_label, cancel_event, match_cache,
+                    output_format, match_export)
+                row.update({"Quote Rows": len(quote_df), "Matched Rows": matched_rows, "Unmatched Rows": unmatched_rows,
+                            "Matched (%)": round(matched_rows * 100 / len(quote_df), 1) if len(quote_df) else None})
+            except ComparisonCancelled:
+                raise
+            except Exception as e:
+                row.update({"Output File": None, "Status": f"Error: {e}"})
+            row["Seconds"] = round(time.perf_counter() - start, 2)
+            summary.append(row)
+
+    summary_df = pd.DataFrame(summary)
+    summary_path = write_batch_summary(summary_df, output_folder, output_format)
+    failed = sum(row["Status"] != "OK" for row in summary)
+    report_result(progress_label, f"\n✅ Done! Compared {len(summary) - failed} of {len(summary)} quotes "
+                                  f"(spec files loaded once in {format_duration(load_seconds)}). "
+                                  f"Summary saved to: {summary_path}")
+    return summary_df
+
+
+# -------- Streaming mode for very large quotes --------
+QUOTE_CHUNK_SIZE = 2000
+
+try:
+    from pandas._libs.parsers import STR_NA_VALUES as EXCEL_NA_STRINGS
+except ImportError:
+    # pd.read_excel's documented default na_values
+    EXCEL_NA_STRINGS = {
+        "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+        "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+        "nan", "null",
+    }
+
+def _unique_column_names(header):
+    # Same naming as pd.read_excel: blank headers become "Unnamed: n", repeats get ".1", ".2", ...
+    columns = []
+    seen = {}
+    for i, name in enumerate(header):
+        if name is None or (isinstance(name, str) and not name):
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+def iter_quote_chunks(quote_path, chunk_size=QUOTE_CHUNK_SIZE):
+    """
+    Yields the first sheet of a quote file as DataFrames of at most chunk_size rows.
+    .xlsx/.xlsm files are streamed through openpyxl's read-only mode; other formats
+    are read whole and then sliced. Always yields at least one (possibly empty) frame.
+    """
+    if not quote_path.lower().endswith((".xlsx", ".xlsm")):
+        quote_df = pd.read_excel(quote_path)
+        if quote_df.empty:
+            yield quote_df
+            return
+        for start in range(0, len(quote_df), chunk_size):
+            yield quote_df.iloc[start:start + chunk_size]
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(quote_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        while header and header[-1] is None:
+            header.pop()
+        columns = _unique_column_names(header)
+        width = len(columns)
+
+        chunk = []
+        yielded = False
+        for values in rows:
+            if all(value is None for value in values):
+                continue  # pd.read_excel skips blank rows too
+            # Cells pd.read_excel would read as NaN ("n/a", "#N/A", ...) become None
+            values = [None if isinstance(value, str) and value in EXCEL_NA_STRINGS else value
+                      for value in values[:width]]
+            values += [None] * (width - len(values))
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                yielded = True
+                chunk = []
+        if chunk or not yielded:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        wb.close()
+
+def _excel_cell_value(value):
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+def _iter_spooled(spool):
+    spool.seek(0)
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+def _iter_spooled_frames(spool, position):
+    for frames in _iter_spooled(spool):
+        yield frames[position]
+
+def _iter_spooled_matched(spool, catalog, priced):
+    # Matched rows are spooled narrow with the chunk's long matches and widened chunk by chunk
+    for matched_df, _, matches, _ in _iter_spooled(spool):
+        yield widen_matches(matched_df, matches, catalog, matched_quote_rows(matches, priced), priced)[0]
+
+def _spooled_matches(spool):
+    # The long match tables of all chunks, with Quote Row counted over the whole quote
+    tables = [matches.assign(**{"Quote Row": matches["Quote Row"] + row_offset})
+              for _, _, matches, row_offset in _iter_spooled(spool)]
+    return pd.concat(tables, ignore_index=True)
+
+def _write_streamed_sheet(ws, columns, frames, original_cols, extra_bold_cols=()):
+    """Appends frames to a write-only worksheet, applying the bold and price fills row by row."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    header = [str(col).strip() for col in columns]
+    bold_cols = {idx for idx, col in enumerate(header) if any(col.lower() == orig_col.lower() for orig_col in original_cols)}
+    bold_cols.update(extra_bold_cols)
+    highlight_cols = find_highlight_columns(header, KNOWN_QUOTE_PRICE_KEYWORDS)
+    bold_font = Font(bold=True)
+    fills = price_highlight_fills()
+
+    header_cells = []
+    for idx, col in enumerate(columns):
+        cell = WriteOnlyCell(ws, value=col)
+        if idx in bold_cols:
+            cell.font = bold_font
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for frame in frames:
+        frame = frame.reindex(columns=columns)
+        codes = classify_price_matrix(price_matrix([frame.iloc[:, idx] for idx in highlight_cols], len(frame)))
+        for values, row_codes in zip(frame.itertuples(index=False, name=None), codes.tolist()):
+            values = [_excel_cell_value(value) for value in values]
+            row_fills = {
+                highlight_cols[pos]: fills[PRICE_HIGHLIGHT_CLASSES[code]]
+                for pos, code in enumerate(row_codes) if code
+            }
+            cells = []
+            for idx, value in enumerate(values):
+                if idx in bold_cols or idx in row_fills:
+                    cell = WriteOnlyCell(ws, value=value)
+                    if idx in bold_cols:
+                        cell.font = bold_font
+                    if idx in row_fills:
+                        cell.fill = row_fills[idx]
+                    cells.append(cell)
+                else:
+                    cells.append(value)
+            ws.append(cells)
+
+def _write_streamed_csv(path, columns, frames):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        pd.DataFrame(columns=columns).to_csv(f, index=False)
+        for frame in frames:
+            frame.reindex(columns=columns).to_csv(f, index=False, header=False)
+
+def _write_streamed_workbook(output_path, spool, catalog, priced, matched_columns, unmatched_columns, original_cols):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws_matched = wb.create_sheet("Matched Parts")
+    _write_streamed_sheet(ws_matched, matched_columns, _iter_spooled_matched(spool, catalog, priced), original_cols)
+    ws_unmatched = wb.create_sheet("Unmatched Parts")
+    extra_bold_cols = [unmatched_columns.index('Spec Difference (Original Spec)')]
+    _write_streamed_sheet(ws_unmatched, unmatched_columns, _iter_spooled_frames(spool, 1), original_cols, extra_bold_cols)
+    wb.save(output_path)
+
+def run_comparator_streaming(quote_path, specs_folder, output_path, progress_label=None, workers=1, cache_dir=None, chunk_size=QUOTE_CHUNK_SIZE, output_format="xlsx", match_export=None, cancel_event=None, match_engine="difflib"):
+    """
+    Variant of run_comparator for very large quotes. Quote rows are read and matched in
+    chunks; each chunk's results are spooled to a temp file and finally streamed into a
+    write-only workbook, so memory stays bounded by the chunk size, not the quote size.
+    All chunks are matched before any is split into matched/unmatched rows, since a row
+    with only a volume (or a text price) counts as matched when its sheet priced any row
+    of the quote, as in run_comparator.
+    """
+    if not os.path.isfile(quote_path) or not os.path.isdir(specs_folder):
+        report_result(progress_label, "❌ Invalid quote file or specs folder path.")
+        return False
+    fingerprint = catalog_fingerprint(specs_folder, match_engine) if cache_dir else None
+    report_progress(progress_label, "Loading spec files...")
+    with profile_phase("load_catalog"):
+        catalog = load_spec_catalog(specs_folder, cache_dir=cache_dir, progress_label=progress_label,
+                                    cancel_event=cancel_event, workers=workers)
+    if match_engine == "vector":
+        with profile_phase("load_catalog.spec_vectors"):
+            catalog.enable_vector_engine()
+
+    quote_columns = None
+    unmatched_columns = None
+    priced_seen = set()
+    has_closest_volumes = False
+    rows_done = 0
+    with tempfile.TemporaryFile() as match_spool, tempfile.TemporaryFile() as spool:
+        with match_executor(catalog, workers) as executor, open_match_cache(cache_dir, catalog, fingerprint) as match_cache:
+            # Pass 1: match every chunk and spool it with its (small) long match table
+            for chunk_df in iter_quote_chunks(quote_path, chunk_size):
+                if _PROFILE is not None:
+                    _PROFILE.count("quote_rows", len(chunk_df))
+                with profile_phase("match"):
+                    matches = match_quote_frame(chunk_df, catalog, executor, workers, cancel_event=cancel_event,
+                                                match_cache=match_cache)
+                priced_seen.update(priced_sheets(matches))
+                pickle.dump((chunk_df, matches), match_spool, protocol=pickle.HIGHEST_PROTOCOL)
+                rows_done += len(chunk_df)
+                report_progress(progress_label, f"Matched {rows_done} quote rows...")
+
+            # Pass 2: split each chunk by the sheets priced anywhere in the quote and
+            # resolve its unmatched rows
+            rows_done = 0
+            for chunk_df, matches in _iter_spooled(match_spool):
+                matched_df, unmatched_df, matches, chunk_has_closest_volumes = compare_quote_frame(
+                    chunk_df, catalog, executor, workers, cancel_event=cancel_event, match_cache=match_cache,
+                    matches=matches, priced=priced_seen)
+                if quote_columns is None:
+                    quote_columns = list(chunk_df.columns)
+                    unmatched_columns = list(unmatched_df.columns)
+                has_closest_volumes = has_closest_volumes or chunk_has_closest_volumes
+                pickle.dump((matched_df, unmatched_df, matches, rows_done), spool, protocol=pickle.HIGHEST_PROTOCOL)
+                rows_done += len(chunk_df)
+                report_progress(progress_label, f"Compared {rows_done} quote rows...")
+        check_cancelled(cancel_event)
+
+        # Matched Parts layout: quote columns, then each matched sheet's price/volume/delta
+        # columns in catalog order, then Remark and the quote spec columns
+        moved_cols = [col for col in ["Remark"] + quote_spec_columns(quote_columns) if col in quote_columns]
+        added_cols = []
+        for sheet in catalog.sheets:
+            if (sheet.file_name, sheet.sheet_name) in priced_seen:
+                added_cols.extend(sheet_match_columns(sheet.file_name, sheet.sheet_name))
+        matched_columns = [col for col in quote_columns if col not in moved_cols] + added_cols + moved_cols
+        dropped_col = "Closest Spec MOQ/Volume" if has_closest_volumes else "Closest Volume"
+        unmatched_columns = [col for col in unmatched_columns if col != dropped_col]
+
+        report_progress(progress_label, "Saving results...")
+        original_cols = [str(c).strip() for c in quote_columns]
+        with profile_phase("write_output"):
+            if output_format == "csv":
+                paths = csv_output_paths(output_path)
+                _write_streamed_csv(paths["Matched Parts"], matched_columns, _iter_spooled_matched(spool, catalog, priced_seen))
+                _write_streamed_csv(paths["Unmatched Parts"], unmatched_columns, _iter_spooled_frames(spool, 1))
+            else:
+                _write_streamed_workbook(output_path, spool, catalog, priced_seen, matched_columns, unmatched_columns, original_cols)
+            if match_export:
+                export_matches(_spooled_matches(spool), match_export_path(output_path, match_export), match_export)
+
+    report_result(progress_label, output_saved_message(output_path, output_format))
+    return True
+
+
+# -------- Spec lookup --------
+# Single-spec lookups for buyers who just want to check one spec against the catalog.
+# The first spec column of every sheet is indexed once into one SpecVectors matrix and
+# kept in memory per specs folder version, so each lookup is a single vectorized pass
+# (well under 100 ms for 100k spec rows) instead of a run_comparator run.
+LOOKUP_COLUMNS = ["Score", "Spec", "Price", "Volume", "Part Number", "Spec File", "Spec Sheet"]
+
+class SpecLookupIndex:
+    """In-memory index over every spec row of a catalog, for lookup()."""
+    def __init__(self, catalog):
+        self.catalog = catalog
+        sheet_ids = []
+        row_labels = []
+        norm_specs = []
+        for sheet_idx, sheet in enumerate(catalog.sheets):
+            spec_col = sheet.spec_cols[0]
+            present = sheet.df[spec_col].notna().to_numpy()
+            sheet_norm_specs = sheet.norm_specs[spec_col][present]
+            sheet_ids.extend([sheet_idx] * len(sheet_norm_specs))
+            row_labels.extend(sheet_norm_specs.index.tolist())
+            norm_specs.extend(sheet_norm_specs.tolist())
+        self.sheet_ids = np.array(sheet_ids, dtype=np.int32)
+        self.row_labels = row_labels
+        self.vectors = SpecVectors(pd.Series(norm_specs, dtype=object))
+        self._price_cols = [self._lookup_price_column(sheet) for sheet in catalog.sheets]
+
+    def __len__(self):
+        return len(self.row_labels)
+
+    @staticmethod
+    def _lookup_price_column(sheet):
+        # The most recent dated price column, else the first price column (as for unmatched parts)
+        dated_cols = [(col, extract_date_from_col(col)) for col in sheet.price_cols]
+        dated_cols = [(col, dt) for col, dt in dated_cols if dt is not None]
+        if dated_cols:
+            return max(dated_cols, key=lambda x: x[1])[0]
+        return sheet.price_cols[0] if sheet.price_cols else None
+
+    def _row_price_and_volume(self, sheet, row, price_col, quote_volume):
+        price = None
+        volume = None
+        if price_col is not None:
+            try:
+                price = float(row[price_col])
+            except (TypeError, ValueError):
+                price = None
+        if price is None and sheet.qty_break_values:
+            # Quantity table: the price of the break closest to the volume, else the smallest break
+            qty_col = sheet.closest_quantity_column(quote_volume) if quote_volume is not None else sheet.qty_break_cols[0]
+            try:
+                price = float(row[qty_col])
+                volume = qty_col
+            except (TypeError, ValueError):
+                price = None
+        if volume is None:
+            for col in row.index:
+                if any(x in col.lower() for x in ["moq", "volume", "qty", "quantity"]) and pd.notna(row[col]):
+                    volume = row[col]
+                    break
+        return price, volume
+
+    def lookup(self, spec, top_k=10, quote_volume=None):
+        """
+        The top_k catalog specs closest to spec, best first, as a LOOKUP_COLUMNS frame.
+        Equal scores keep catalog order. quote_volume picks the quantity-break price.
+        """
+        if not str(spec).strip() or not len(self):
+            return pd.DataFrame(columns=LOOKUP_COLUMNS)
+        scores = self.vectors.similarity(spec)
+        top_k = min(top_k, len(scores))
+        # k-th best score via a partial sort; of the specs tied with it the first in catalog order win
+        kth_score = -np.partition(-scores, top_k - 1)[top_k - 1]
+        above = np.flatnonzero(scores > kth_score)
+        tied = np.flatnonzero(scores == kth_score)[:top_k - len(above)]
+        candidates = np.concatenate([above, tied])
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        records = []
+        for pos in candidates.tolist():
+            sheet_idx = int(self.sheet_ids[pos])
+            sheet = self.catalog.sheets[sheet_idx]
+            row = sheet.df.loc[self.row_labels[pos]]
+            price, volume = self._row_price_and_volume(sheet, row, self._price_cols[sheet_idx], quote_volume)
+            part_number = row[sheet.part_number_col] if sheet.part_number_col else None
+            part_number = str(part_number) if pd.notna(part_number) else None
+            records.append((float(scores[pos]), str(row[sheet.spec_cols[0]]), price, volume, part_number,
+                            sheet.file_name, sheet.sheet_name))
+        return pd.DataFrame(records, columns=LOOKUP_COLUMNS)
+
+
+_LOOKUP_INDEXES = {}
+
+def get_spec_lookup_index(specs_folder, cache_dir=None):
+    """The folder's SpecLookupIndex, built on first use and rebuilt once any spec file changes."""
+    fingerprint = catalog_fingerprint(specs_folder, "lookup")
+    key = os.path.abspath(specs_folder)
+    cached = _LOOKUP_INDEXES.get(key)
+    if cached is None or cached[0] != fingerprint:
+        _LOOKUP_INDEXES[key] = (fingerprint, SpecLookupIndex(load_spec_catalog(specs_folder, cache_dir=cache_dir)))
+    return _LOOKUP_INDEXES[key][1]
+
+def lookup_spec(spec, specs_folder, top_k=10, quote_volume=None, cache_dir=None):
+    """
+    Closest catalog specs to one typed spec, with price, volume, part number, file and
+    sheet (see SpecLookupIndex.lookup). The specs folder stays indexed between calls.
+    """
+    return get_spec_lookup_index(specs_folder, cache_dir).lookup(spec, top_k, quote_volume)
 
 
+# -------- GUI Implementation --------
 def launch_gui():
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+
     root = tk.Tk()
     root.title("Spec Comparator Tool")
-    root.geometry("600x320")
+    root.geometry("760x640")
 
     frame = ttk.Frame(root, padding=20)
     frame.pack(expand=True, fill="both")
@@ -909,6 +2835,10 @@ def launch_gui():
     quote_var = tk.StringVar()
     specs_var = tk.StringVar()
     output_var = tk.StringVar(value="Quote_Spec_Comparison.xlsx")
+    workers_var = tk.IntVar(value=1)
+    cache_var = tk.BooleanVar(value=True)
+    profile_var = tk.BooleanVar(value=False)
+    vector_var = tk.BooleanVar(value=False)
 
     def browse_quote():
         path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
@@ -937,56 +2867,232 @@ def launch_gui():
     ttk.Entry(frame, textvariable=output_var, width=50).grid(row=2, column=1, padx=5)
     ttk.Button(frame, text="Browse", command=browse_output).grid(row=2, column=2, padx=5)
 
-    progress_label = ttk.Label(frame, text="")
-    progress_label.grid(row=4, column=1, pady=10)
+    ttk.Label(frame, text="Worker Processes:").grid(row=3, column=0, sticky="w", pady=5)
+    ttk.Spinbox(frame, from_=1, to=os.cpu_count() or 1, textvariable=workers_var, width=5).grid(row=3, column=1, sticky="w", padx=5)
+    ttk.Checkbutton(frame, text="Cache spec files and matches", variable=cache_var).grid(row=3, column=1, sticky="e", padx=5)
+    ttk.Checkbutton(frame, text="Match by spec attributes", variable=vector_var).grid(row=4, column=1, sticky="w", padx=5)
+    ttk.Checkbutton(frame, text="Write profiling report", variable=profile_var).grid(row=4, column=1, sticky="e", padx=5)
 
-    def on_run():
-        progress_label.config(text="Running...")
-        root.update_idletasks()
+    progress_label = ttk.Label(frame, text="", wraplength=540)
+    progress_label.grid(row=6, column=0, columnspan=3, pady=10)
+
+    # The comparison runs on a worker thread so the window stays responsive. Tk widgets
+    # must only be touched from the main thread, so the worker posts its progress
+    # messages and outcome to a queue that the main loop polls with root.after.
+    events = queue.Queue()
+    cancel_event = threading.Event()
+
+    def run_in_background(quote_path, specs_folder, output_path, workers, cache_dir, profile, match_engine):
+        def post_progress(text):
+            events.put(("progress", text))
         try:
-            run_comparator(quote_var.get(), specs_var.get(), output_var.get(), progress_label)
+            run_comparator(quote_path, specs_folder, output_path, post_progress, workers=workers,
+                           cache_dir=cache_dir, profile=profile, cancel_event=cancel_event, match_engine=match_engine)
+            events.put(("finished", None))
+        except ComparisonCancelled:
+            events.put(("cancelled", None))
         except Exception as e:
-            messagebox.showerror("Error", str(e))
-            progress_label.config(text="Error occurred.")
+            events.put(("error", str(e)))
 
-    ttk.Button(frame, text="Run Comparison", command=on_run).grid(row=3, column=1, pady=20)
+    def poll_events():
+        while True:
+            try:
+                kind, payload = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress_label.config(text=payload.strip())
+                continue
+            run_button.config(state="normal")
+            cancel_button.config(state="disabled")
+            if kind == "cancelled":
+                progress_label.config(text="Comparison cancelled.")
+            elif kind == "error":
+                messagebox.showerror("Error", payload)
+                progress_label.config(text="Error occurred.")
+            return
+        root.after(100, poll_events)
 
+    def on_run():
+        try:
+            workers = workers_var.get()
+        except tk.TclError:
+            messagebox.showerror("Error", "Worker Processes must be a whole number.")
+            return
+        cache_dir = default_catalog_cache_dir() if cache_var.get() else None
+        cancel_event.clear()
+        run_button.config(state="disabled")
+        cancel_button.config(state="normal")
+        progress_label.config(text="Running...")
+        threading.Thread(
+            target=run_in_background,
+            args=(quote_var.get(), specs_var.get(), output_var.get(), workers, cache_dir, profile_var.get(),
+                  "vector" if vector_var.get() else "difflib"),
+            daemon=True).start()
+        root.after(100, poll_events)
+
+    def on_cancel():
+        cancel_event.set()
+        cancel_button.config(state="disabled")
+        progress_label.config(text="Cancelling...")
+
+    def on_close():
+        # Stop a running comparison at its next checkpoint so its worker processes exit too
+        cancel_event.set()
+        root.destroy()
+
+    run_button = ttk.Button(frame, text="Run Comparison", command=on_run)
+    run_button.grid(row=5, column=1, pady=20, sticky="w", padx=60)
+    cancel_button = ttk.Button(frame, text="Cancel", command=on_cancel, state="disabled")
+    cancel_button.grid(row=5, column=1, pady=20, sticky="e", padx=60)
+
+    # --- Spec lookup: the closest catalog specs to a typed spec, updated while typing ---
+    ttk.Separator(frame).grid(row=7, column=0, columnspan=3, sticky="ew", pady=5)
+    lookup_var = tk.StringVar()
+    ttk.Label(frame, text="Look Up a Spec:").grid(row=8, column=0, sticky="w", pady=5)
+    ttk.Entry(frame, textvariable=lookup_var, width=50).grid(row=8, column=1, padx=5)
+    lookup_status = ttk.Label(frame, text="")
+    lookup_status.grid(row=9, column=0, columnspan=3, sticky="w")
+    lookup_tree = ttk.Treeview(frame, columns=LOOKUP_COLUMNS, show="headings", height=8)
+    for col, width in zip(LOOKUP_COLUMNS, (55, 250, 60, 60, 90, 110, 80)):
+        lookup_tree.heading(col, text=col)
+        lookup_tree.column(col, width=width, anchor="w")
+    lookup_tree.grid(row=10, column=0, columnspan=3, sticky="nsew")
+
+    # The folder is indexed on a background thread, again whenever a spec file changes;
+    # lookups then run on the main thread, debounced to one per pause in typing
+    lookup_state = {"folder": None, "fingerprint": None, "index": None, "error": None, "after_id": None}
+
+    def build_lookup_index(specs_folder, fingerprint, cache_dir):
+        try:
+            index, error = get_spec_lookup_index(specs_folder, cache_dir), None
+        except Exception as e:
+            index, error = None, str(e)
+        if (lookup_state["folder"], lookup_state["fingerprint"]) == (specs_folder, fingerprint):
+            lookup_state.update(index=index, error=error)
+
+    def run_lookup():
+        lookup_state["after_id"] = None
+        specs_folder = specs_var.get()
+        if not os.path.isdir(specs_folder):
+            lookup_status.config(text="Select a specs folder to look up specs.")
+            return
+        # Only stats the spec files, so it is cheap enough to check on every lookup
+        fingerprint = catalog_fingerprint(specs_folder, "lookup")
+        if (lookup_state["folder"], lookup_state["fingerprint"]) != (specs_folder, fingerprint):
+            lookup_state.update(folder=specs_folder, fingerprint=fingerprint, index=None, error=None)
+            cache_dir = default_catalog_cache_dir() if cache_var.get() else None
+            threading.Thread(target=build_lookup_index, args=(specs_folder, fingerprint, cache_dir),
+                             daemon=True).start()
+        if lookup_state["error"]:
+            lookup_status.config(text=f"Could not index the spec files: {lookup_state['error']}")
+            return
+        index = lookup_state["index"]
+        if index is None:
+            lookup_status.config(text="Indexing spec files...")
+            lookup_state["after_id"] = root.after(200, run_lookup)
+            return
+
+        results = index.lookup(lookup_var.get(), top_k=20)
+        lookup_tree.delete(*lookup_tree.get_children())
+        for record in results.itertuples(index=False):
+            values = ["" if value is None or (isinstance(value, float) and np.isnan(value)) else value for value in record]
+            values[0] = f"{round(record[0] * 100, 1)}%"
+            lookup_tree.insert("", "end", values=values)
+        lookup_status.config(text=f"{len(results)} closest of {len(index)} spec rows")
+
+    def on_lookup_typed(*_):
+        if lookup_state["after_id"] is not None:
+            root.after_cancel(lookup_state["after_id"])
+        lookup_state["after_id"] = root.after(150, run_lookup)
+
+    lookup_var.trace_add("write", on_lookup_typed)
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
     root.mainloop()
 
 
-if __name__ == "__main__":
-    launch_gui()
+def main(argv=None):
+    """
+    Headless entry point, e.g. for overnight runs on a server:
+        python Spec_Comparator.py quote.xlsx specs_folder output.xlsx --workers 8
+    A folder of quotes runs them all as one batch (see run_batch_comparator):
+        python Spec_Comparator.py quotes_folder specs_folder output_folder --workers 8
+    Progress goes to stderr. Returns 0 on success, 1 if the comparison failed and 2
+    for invalid arguments or paths.
+    """
+    parser = argparse.ArgumentParser(
+        prog="Spec_Comparator",
+        description="Match quote items against spec files and compare prices, without the GUI.")
+    parser.add_argument("quote", help="Quote items Excel file, or a folder of quote files to compare as one batch")
+    parser.add_argument("specs_folder", help="Folder containing the spec files (.xls, .xlsx, .xlsb)")
+    parser.add_argument("output", nargs="?",
+                        help="Output file (default: Quote_Spec_Comparison.xlsx), or for a batch the output folder "
+                             "(default: Quote_Spec_Comparisons)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes used for matching (default: 1)")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--cache-dir", default=default_catalog_cache_dir(),
+                             help="Cache directory for parsed spec files and match results (default: %(default)s)")
+    cache_group.add_argument("--no-cache", action="store_true", help="Parse every spec file and search every quote spec again")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format; csv writes <output>_matched.csv and <output>_unmatched.csv "
+                             "(default: from the output file extension, else xlsx)")
+    parser.add_argument("--chunk-size", type=int,
+                        help="Read and match the quote in chunks of this many rows, for very large quotes")
+    parser.add_argument("--export-matches", choices=MATCH_EXPORT_FORMATS,
+                        help="Also write the long match table (quote row, file, sheet, price, volume, delta, score) "
+                             "to <output>_matches.csv or .parquet (parquet needs pyarrow)")
+    parser.add_argument("--engine", choices=MATCH_ENGINES, default="difflib",
+                        help="Fuzzy scoring: difflib string similarity, or vector to compare parsed spec attributes "
+                             "(GSM, size, pages, colors) and tokens regardless of word order (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true", help="Also write a <output>_profile.json timing report")
+    args = parser.parse_args(argv)
+
+    batch = os.path.isdir(args.quote)
+    output = args.output or ("Quote_Spec_Comparisons" if batch else "Quote_Spec_Comparison.xlsx")
+    output_format = args.format or ("csv" if not batch and output.lower().endswith(".csv") else "xlsx")
+    if args.export_matches == "parquet" and not any(importlib.util.find_spec(m) for m in ("pyarrow", "fastparquet")):
+        print("❌ --export-matches parquet needs pyarrow: pip install pyarrow", file=sys.stderr)
+        return 2
+    if batch and args.chunk_size:
+        print("❌ --chunk-size is not supported for a folder of quotes", file=sys.stderr)
+        return 2
+    if batch and not list_quote_files(args.quote):
+        print(f"❌ No quote files found in: {args.quote}", file=sys.stderr)
+        return 2
+    if not batch and not os.path.isfile(args.quote):
+        print(f"❌ Quote file not found: {args.quote}", file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.specs_folder):
+        print(f"❌ Specs folder not found: {args.specs_folder}", file=sys.stderr)
+        return 2
+
+    def progress(text):
+        print(text.strip(), file=sys.stderr, flush=True)
 
-def get_diff_chars(a, b):
-    # Normalize: lowercase and remove spaces for comparison
-    a_raw, b_raw = str(a), str(b)
-    a_norm = ''.join(a_raw.lower().split())
-    b_norm = ''.join(b_raw.lower().split())
-    matcher = difflib.SequenceMatcher(None, a_norm, b_norm)
-    diff_a = []
-    diff_b = []
+    try:
+        if batch:
+            summary_df = run_batch_comparator(args.quote, args.specs_folder, output, progress,
+                                              workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir,
+                                              profile=args.profile, output_format=output_format,
+                                              match_export=args.export_matches, match_engine=args.engine)
+            return 0 if summary_df is not None and (summary_df["Status"] == "OK").all() else 1
+        done = run_comparator(args.quote, args.specs_folder, output, progress,
+                              workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir,
+                              chunk_size=args.chunk_size, profile=args.profile, output_format=output_format,
+                              match_export=args.export_matches, match_engine=args.engine)
+    except KeyboardInterrupt:
+        print("Cancelled.", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        return 1
+    return 0 if done else 1
 
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        # Map normalized indices back to raw string indices
-        if tag in ('replace', 'delete'):
-            # Find corresponding chars in original a
-            raw = ''
-            count = 0
-            for c in a_raw:
-                if c.lower() != ' ':
-                    if count >= i1 and count < i2:
-                        raw += c
-                    count += 1
-            diff_a.append(raw)
-        if tag in ('replace', 'insert'):
-            # Find corresponding chars in original b
-            raw = ''
-            count = 0
-            for c in b_raw:
-                if c.lower() != ' ':
-                    if count >= j1 and count < j2:
-                        raw += c
-                    count += 1
-            diff_b.append(raw)
-    return ''.join(diff_b), ''.join(diff_a)
 
+if __name__ == "__main__":
+    # Needed for the matching process pool in PyInstaller builds on Windows
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    launch_gui()
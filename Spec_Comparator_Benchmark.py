@@ -0,0 +1,263 @@
+"""
+Scaling benchmark for the Spec Comparator matching engine.
+
+Generates synthetic spec workbooks and quotes, then times each phase of a comparison
+(catalog load, exact/fuzzy matching, closest-spec search for unmatched rows, workbook
+output) over a grid of quote rows x spec rows x sheets.
+
+Example:
+    python Spec_Comparator_Benchmark.py --quote-rows 50,200 --spec-rows 200,1000 --sheets 2,4 --csv bench.csv
+
+--load-workers 1,2,4 also times loading each specs folder with that many parsing
+processes and reports the speedup over the first count.
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import Spec_Comparator as sc
+
+PAPERS = ["70GSM", "80GSM", "100GSM", "120GSM", "150GSM", "250GSM"]
+SIZES = ["A4", "A5", "LETTER", "LEGAL", "210x297mm", "148x210mm"]
+COLORS = ["4C/4C", "4C/1C", "1C/1C", "4C/0C"]
+FINISHES = ["MATTE", "GLOSS", "UNCOATED", "SOFT TOUCH"]
+BOXES = ["5x6x3", "8x10x2", "12x9x4", "3.5x3.5x1"]
+FILLER_WORDS = ["booklet", "insert", "label", "sleeve", "carton", "manual", "leaflet", "warranty", "guide", "sticker"]
+QUANTITY_COLUMNS = ["1K", "5K", "10K", "50K"]
+
+
+def make_spec(rng):
+    """One free-text spec with key-value pairs (GSM:80) and a dimension (5x6x3)."""
+    parts = [
+        f"Paper:{rng.choice(PAPERS)}",
+        f"Size:{rng.choice(SIZES)}",
+        f"Pages:{rng.choice([4, 8, 16, 24, 32, 48, 64])}",
+        f"Color:{rng.choice(COLORS)}",
+        f"Finish:{rng.choice(FINISHES)}",
+    ]
+    if rng.random() < 0.5:
+        parts.append(f"Box:{rng.choice(BOXES)}")
+    rng.shuffle(parts)
+    return "; ".join(parts) + f"; Ref:{rng.randint(1000, 99999)}"
+
+
+def make_fuzzy_variant(spec, rng):
+    """A near-miss of spec: different spacing/casing and one edited character."""
+    variant = spec.replace(":", ": ").lower()
+    pos = rng.randrange(len(variant))
+    return variant[:pos] + rng.choice("0123456789") + variant[pos + 1:]
+
+
+def make_unrelated_spec(rng):
+    return " ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(4, 8)))
+
+
+def generate_spec_folder(folder, sheets, spec_rows, seed=0, files=None):
+    """
+    Writes `sheets` spec sheets of `spec_rows` rows each, spread over `files` workbooks.
+    Every third sheet is a volume table (Spec/Volume/pricing), every third a quantity
+    table (Specs plus 1K/5K/... columns) and the rest free-text price lists.
+    Returns the list of generated (spec, kind) pairs.
+    """
+    rng = random.Random(seed)
+    files = files or max(1, sheets // 2)
+    os.makedirs(folder, exist_ok=True)
+    generated = []
+    sheet_idx = 0
+    for file_idx in range(files):
+        sheets_in_file = sheets // files + (1 if file_idx < sheets % files else 0)
+        path = os.path.join(folder, f"Supplier{file_idx + 1:03d}.xlsx")
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            # A cover sheet without a spec column, as real supplier files have
+            pd.DataFrame({"Notes": ["Synthetic benchmark file"]}).to_excel(writer, sheet_name="Cover", index=False)
+            for _ in range(sheets_in_file):
+                kind = ("volume", "quantity", "free")[sheet_idx % 3]
+                specs = [make_spec(rng) for _ in range(spec_rows)]
+                if kind == "volume":
+                    rows = []
+                    for spec in specs[: max(1, spec_rows // 2)]:
+                        for qty in ("1K", "5K"):
+                            rows.append({"Spec": spec, "Volume": qty, "pricing": round(rng.uniform(0.05, 5), 4)})
+                    df = pd.DataFrame(rows)
+                elif kind == "quantity":
+                    df = pd.DataFrame({"HPPart#": [f"Q{sheet_idx}-{i}" for i in range(spec_rows)], "Specs": specs})
+                    for col in QUANTITY_COLUMNS:
+                        df[col] = [round(rng.uniform(0.05, 5), 4) for _ in range(spec_rows)]
+                else:
+                    df = pd.DataFrame({
+                        "Part Number": [f"P{sheet_idx}-{i}" for i in range(spec_rows)],
+                        "Specs": specs,
+                        "Unit Price": [round(rng.uniform(0.05, 5), 4) for _ in range(spec_rows)],
+                        "MOQ": [rng.choice([500, 1000, 5000]) for _ in range(spec_rows)],
+                    })
+                df.to_excel(writer, sheet_name=f"Sheet{sheet_idx + 1}", index=False)
+                spec_col = "Spec" if kind == "volume" else "Specs"
+                generated.extend((spec, kind) for spec in df[spec_col].unique())
+                sheet_idx += 1
+    return generated
+
+
+def generate_quote(path, catalog_specs, rows, exact_ratio=0.4, fuzzy_ratio=0.3, seed=0):
+    """Writes a quote whose rows are exact, fuzzy or no-match copies of catalog specs in the given ratios."""
+    rng = random.Random(seed + 1)
+    quote_rows = []
+    for i in range(rows):
+        r = rng.random()
+        spec, _ = rng.choice(catalog_specs)
+        if r < exact_ratio:
+            quote_spec = spec
+        elif r < exact_ratio + fuzzy_ratio:
+            quote_spec = make_fuzzy_variant(spec, rng)
+        else:
+            quote_spec = make_unrelated_spec(rng)
+        quote_rows.append({
+            "Item": i + 1,
+            "HPPart#": f"QT{i + 1:06d}",
+            "SPECs": quote_spec,
+            "Volume": rng.choice(["1K", "5K", 2000, 7500]),
+            "May'25 Price": round(rng.uniform(0.05, 5), 4),
+            "Remark": "",
+        })
+    pd.DataFrame(quote_rows).to_excel(path, index=False)
+
+
+def run_case(work_dir, specs_folder, catalog_specs, quote_rows, workers=1, exact_ratio=0.4, fuzzy_ratio=0.3, seed=0, engine="difflib"):
+    """Runs one grid point against a generated specs folder and returns its phase timings and throughput."""
+    quote_path = os.path.join(work_dir, f"quote_{quote_rows}_{os.path.basename(specs_folder)}.xlsx")
+    generate_quote(quote_path, catalog_specs, quote_rows, exact_ratio, fuzzy_ratio, seed=seed)
+    quote_df = pd.read_excel(quote_path)
+
+    timings = {}
+    sc.clear_normalization_caches()
+
+    start = time.perf_counter()
+    catalog = sc.load_spec_catalog(specs_folder)
+    if engine == "vector":
+        catalog.enable_vector_engine()
+    timings["load_s"] = time.perf_counter() - start
+
+    with sc.match_executor(catalog, workers) as executor:
+        start = time.perf_counter()
+        result_df, added_cols = sc.match_specs_and_append_prices(
+            quote_df, specs_folder, catalog=catalog, executor=executor, workers=workers)
+        timings["match_s"] = time.perf_counter() - start
+
+        if added_cols:
+            unmatched_mask = result_df[added_cols].isna().all(axis=1)
+        else:
+            unmatched_mask = pd.Series(True, index=result_df.index)
+        unmatched_df = result_df[unmatched_mask]
+        spec_col = sc.find_spec_columns(unmatched_df.columns)[0]
+        rows = list(zip(unmatched_df[spec_col].tolist(), sc.find_quote_volumes(unmatched_df)))
+        start = time.perf_counter()
+        sc.resolve_unmatched_rows(rows, catalog, executor, workers)
+        timings["closest_s"] = time.perf_counter() - start
+
+    output_path = os.path.join(work_dir, "bench_output.xlsx")
+    start = time.perf_counter()
+    sc.write_comparison_workbook(output_path, result_df[~unmatched_mask], unmatched_df.drop(columns=added_cols), quote_df.columns)
+    timings["write_s"] = time.perf_counter() - start
+
+    catalog_rows = sum(len(sheet.df) for sheet in catalog.sheets)
+    total = sum(timings.values())
+    return {
+        "quote_rows": quote_rows,
+        "catalog_sheets": len(catalog.sheets),
+        "catalog_rows": catalog_rows,
+        "unmatched_rows": len(rows),
+        "workers": workers,
+        "engine": engine,
+        **{k: round(v, 4) for k, v in timings.items()},
+        "total_s": round(total, 4),
+        "match_rows_per_s": round(quote_rows / timings["match_s"], 1) if timings["match_s"] else None,
+        "closest_rows_per_s": round(len(rows) / timings["closest_s"], 1) if rows and timings["closest_s"] else None,
+        "scored_pairs_per_s": round(quote_rows * catalog_rows / total, 1) if total else None,
+    }
+
+
+def time_catalog_load(specs_folder, load_workers):
+    """Catalog load time for each worker count, with the speedup over the first count."""
+    results = []
+    for workers in load_workers:
+        start = time.perf_counter()
+        catalog = sc.load_spec_catalog(specs_folder, workers=workers)
+        load_s = time.perf_counter() - start
+        baseline = results[0]["load_s"] if results else load_s
+        results.append({
+            "load_workers": workers,
+            "load_s": round(load_s, 4),
+            "speedup": round(baseline / load_s, 2) if load_s else None,
+            "catalog_sheets": len(catalog.sheets),
+        })
+    return results
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for Spec_Comparator.")
+    parser.add_argument("--quote-rows", type=parse_int_list, default=[50, 200], help="Comma-separated quote row counts")
+    parser.add_argument("--spec-rows", type=parse_int_list, default=[200, 1000], help="Comma-separated rows per spec sheet")
+    parser.add_argument("--sheets", type=parse_int_list, default=[3, 6], help="Comma-separated spec sheet counts")
+    parser.add_argument("--exact", type=float, default=0.4, help="Share of quote rows that exactly match a catalog spec")
+    parser.add_argument("--fuzzy", type=float, default=0.3, help="Share of quote rows that are near-misses of a catalog spec")
+    parser.add_argument("--files", type=int, help="Spec workbooks the sheets are spread over (default: sheets / 2)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes used for matching")
+    parser.add_argument("--load-workers", type=parse_int_list, default=[],
+                        help=f"Comma-separated parsing process counts to time catalog loading with "
+                             f"({os.cpu_count()} cores here)")
+    parser.add_argument("--engine", choices=sc.MATCH_ENGINES, default="difflib", help="Fuzzy scoring engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Keep generated files here instead of a temp folder")
+    parser.add_argument("--csv", help="Also write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="spec_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for sheets in args.sheets:
+            for spec_rows in args.spec_rows:
+                specs_folder = os.path.join(work_dir, f"specs_{spec_rows}x{sheets}")
+                catalog_specs = generate_spec_folder(specs_folder, sheets, spec_rows, seed=args.seed, files=args.files)
+                for load in time_catalog_load(specs_folder, args.load_workers):
+                    print(
+                        f"load  spec_rows={spec_rows:>6} sheets={sheets:>3} | "
+                        f"{load['load_workers']:>3} workers {load['load_s']:>7.3f}s  speedup x{load['speedup']:.2f}",
+                        flush=True,
+                    )
+                for quote_rows in args.quote_rows:
+                    result = run_case(work_dir, specs_folder, catalog_specs, quote_rows, args.workers, args.exact, args.fuzzy, args.seed, args.engine)
+                    result = dict(result, spec_rows=spec_rows, sheets=sheets)
+                    results.append(result)
+                    print(
+                        f"quote={quote_rows:>6} spec_rows={spec_rows:>6} sheets={sheets:>3} | "
+                        f"load {result['load_s']:>7.3f}s  match {result['match_s']:>7.3f}s  "
+                        f"closest {result['closest_s']:>7.3f}s  write {result['write_s']:>7.3f}s | "
+                        f"{result['match_rows_per_s'] or 0:>8.1f} match rows/s",
+                        flush=True,
+                    )
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.csv and results:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Results written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())